@@ -3,8 +3,157 @@
 # Assignment: 6
 # Description: Assignment 6 for Summer 2021 CS 261, involving directed graphs.
 
+import functools
 import heapq
+import mmap
+import os
+from array import array
+from bisect import bisect_left
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat, zip_longest
+from multiprocessing.shared_memory import SharedMemory
+from numbers import Integral
+from operator import add
+
+from graph_cache import memoized
+from graph_lock import ReadWriteLock, install_lock, reading
+from graph_traversal import bfs_order, bfs_tree, dfs_order, dfs_tree, end_vertex
+
+# largest edge weight for which Dijkstra uses Dial's bucket queue, and then delta-stepping
+DIAL_MAX_WEIGHT = 1024
+DELTA_MAX_WEIGHT = 1 << 16
+# fewest vertices for which all_pairs_shortest_paths starts a process pool by default, as
+# starting the workers takes longer than the searches themselves on smaller graphs
+PARALLEL_MIN_VERTICES = 512
+# largest edge weight, as weights are stored in arrays of 64-bit integers
+MAX_WEIGHT = (1 << 63) - 1
+
+
+def compact_array(values: array) -> array:
+    """
+    Returns VALUES as an array of 32-bit integers if they all fit, or unchanged otherwise
+    """
+    if len(values) == 0 or (min(values) >= -2 ** 31 and max(values) < 2 ** 31):
+        return array('i', values)
+    return values
+
+
+def trace_path(previous: dict, v) -> []:
+    """
+    Follows the PREVIOUS links back from vertex V and returns the path ending at V
+    """
+    path = []
+    while v is not None:
+        path.append(v)
+        v = previous[v]
+    path.reverse()
+    return path
+
+
+def bit_positions(bits: int) -> []:
+    """
+    Returns the positions of the set bits of BITS in ascending order. The scan for each set
+    bit runs in C over the binary string, rather than shifting the whole integer once per bit.
+    """
+    text = bin(bits)[:1:-1]
+    positions = []
+    pos = text.find('1')
+    while pos >= 0:
+        positions.append(pos)
+        pos = text.find('1', pos + 1)
+    return positions
+
+
+def bits_from(positions: [], size: int) -> int:
+    """
+    Returns an integer with the bits at POSITIONS set, all positions being below SIZE
+    """
+    packed = bytearray((size + 7) // 8)
+    for pos in positions:
+        packed[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(packed, 'little')
+
+
+def write_edge(matrix, src: int, dst: int, weight: int) -> None:
+    """
+    Sets the weight of edge (src, dst) for an assignment to a row view of matrix. If the
+    matrix stores the edges of a graph, the write goes through the graph's add_edge or
+    remove_edge (for weight 0), so the graph's rules apply and its version is bumped.
+    """
+    graph = matrix.graph
+    if graph is None:
+        matrix.set(src, dst, weight)
+    elif weight == 0:
+        graph.remove_edge(src, dst)
+    else:
+        graph.add_edge(src, dst, weight)
+
+
+def share_arrays(arrays: []) -> tuple:
+    """
+    Copies ARRAYS into one block of shared memory, each starting on an 8-byte boundary, and
+    returns the block with its layout, a list of (typecode, start, length) per array
+    """
+    views = [memoryview(values) for values in arrays]
+    layout, size = [], 0
+    for view in views:
+        size += -size % 8
+        layout.append((view.format, size, len(view)))
+        size += view.nbytes
+    block = SharedMemory(create=True, size=max(size, 1))
+    for view, (_, start, _) in zip(views, layout):
+        block.buf[start:start + view.nbytes] = view.cast('B')
+    return block, layout
+
+
+def attach_arrays(buffer, layout: []) -> []:
+    """
+    Returns read-only views of the arrays that share_arrays placed in BUFFER
+    """
+    views = []
+    for typecode, start, length in layout:
+        end = start + length * array(typecode).itemsize
+        views.append(buffer[start:end].toreadonly().cast(typecode))
+    return views
+
+
+def dijkstra_shard(graph_name: str, layout: [], v_count: int, out_name, out_path, typecode: str,
+                   sources: range) -> None:
+    """
+    Worker for DirectedGraph.all_pairs_shortest_paths. Attaches to the CSR arrays of the graph
+    in shared memory (GRAPH_NAME), runs Dijkstra from every vertex in SOURCES and writes each
+    row of distances into the output table, which is either the shared memory block OUT_NAME
+    or the memory-mapped file OUT_PATH
+    """
+    block = SharedMemory(name=graph_name)
+    matrix = CSRMatrix()
+    matrix.offsets, matrix.targets, matrix.weights = attach_arrays(block.buf, layout)
+    adj = [matrix.neighbors(v) for v in range(v_count)]
+    fill = DirectedGraph.distance_engine(matrix.max_weight())
+    for view in (matrix.offsets, matrix.targets, matrix.weights):
+        view.release()
+    block.close()
+
+    if out_path is not None:
+        file = open(out_path, 'r+b')
+        out = mmap.mmap(file.fileno(), 0)
+    else:
+        file = None
+        out = SharedMemory(name=out_name)
+    table = memoryview(out if file is not None else out.buf).cast(typecode)
+
+    # searches in doubles, as float32 comparisons could settle a vertex too early
+    inf_row = array('d', [float("inf")]) * v_count
+    for src in sources:
+        distances = array('d', inf_row)
+        fill([src], distances, adj.__getitem__)
+        table[src * v_count:(src + 1) * v_count] = array(typecode, distances)
+
+    table.release()
+    out.close()
+    if file is not None:
+        file.close()
 
 
 class DirectedGraph:
@@ -54,29 +203,170 @@ class DirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    # optional TopologicalOrder, enabled with track_topological_order()
+    topology = None
+    # bumped by every change to the graph, so memoized queries know when to recompute
+    version = 0
+    # ReadWriteLock used by the concurrency mode, enabled with enable_locking()
+    lock = None
+    read_methods = ('get_vertices', 'get_edges', 'is_valid_path', 'dfs', 'bfs', 'has_cycle',
+                    'find_cycle', 'topological_order', 'dijkstra', 'dijkstra_many',
+                    'all_pairs_shortest_paths', 'shortest_path', 'astar', 'bfs_levels',
+                    'bfs_distances', 'max_weight', 'freeze', 'neighbors', 'predecessors',
+                    'successors', 'predecessor_list', 'topological_sort')
+    write_methods = ('add_vertex', 'add_vertices', 'add_edge', 'remove_edge',
+                     'load_edge_arrays', 'load_edges', 'track_topological_order')
+    iter_methods = ('iter_edges', 'iter_dfs', 'iter_bfs')
+
+    @property
+    def adj_matrix(self):
+        """
+        Edge storage of the graph. Rows can be indexed and iterated like the rows of a list of
+        lists, with 0 meaning there is no edge.
+        """
+        return self.storage
+
+    @adj_matrix.setter
+    def adj_matrix(self, value):
+        # a list of lists (such as the empty list from __init__) is copied into a DenseMatrix
+        if isinstance(value, list):
+            value = DenseMatrix.from_rows(value)
+        value.graph = self
+        self.storage = value
+        # replacing the storage changes the edges as much as any mutator does
+        self.version += 1
+
+    def enable_locking(self) -> ReadWriteLock:
+        """
+        A method that switches the graph to concurrency mode and returns its lock. From then on
+        queries hold the lock for reading, so any number of them run in parallel, and methods
+        that change the graph hold it for writing, so readers never see a half-applied update.
+        Only this graph's methods are wrapped, so graphs that are not in concurrency mode do
+        not pay for locking. The lock can also be held directly to group several calls.
+        """
+        if self.lock is None:
+            self.lock = ReadWriteLock()
+            install_lock(self, self.lock, self.read_methods, self.write_methods,
+                         self.iter_methods)
+        return self.lock
+
+    def freeze(self) -> 'FrozenDirectedGraph':
+        """
+        A method that returns a read-only snapshot of the graph in compact CSR arrays, on which
+        all queries (dfs, bfs, dijkstra, shortest_path, is_valid_path, has_cycle, ...) run
+        unchanged. The snapshot does not change when this graph does.
+        """
+        return FrozenDirectedGraph(self)
+
+    @classmethod
+    def from_edge_arrays(cls, src, dst, weight=None) -> 'DirectedGraph':
+        """
+        A method that builds a graph from parallel sequences of source indices, destination
+        indices and weights (lists, arrays, NumPy arrays or any other iterables). The result is
+        the same as passing the edges as start_edges, but the matrix is filled in one pass
+        instead of one add_edge call per edge. If weight is None, every edge has weight 1.
+        """
+        graph = cls()
+        graph.load_edge_arrays(src, dst, weight)
+        return graph
+
+    @classmethod
+    def from_iterable(cls, edges) -> 'DirectedGraph':
+        """
+        A method that builds a graph from an iterable of (src, dst, weight) tuples, reading it
+        only once so that generators and other one-shot iterators can be used.
+        """
+        graph = cls()
+        graph.load_edges(edges)
+        return graph
+
+    def load_edge_arrays(self, src, dst, weight=None) -> None:
+        """
+        Helper method that replaces the contents of the graph with the edges in the parallel
+        sequences, in the same way as load_edges
+        """
+        columns = (src, dst) if weight is None else (src, dst, weight)
+
+        def edges():
+            missing = object()
+            for edge in zip_longest(*columns, fillvalue=missing):
+                if missing in edge:
+                    raise ValueError('edge arrays must have the same length')
+                yield edge if weight is not None else (*edge, 1)
+
+        self.load_edges(edges())
+
+    def load_edges(self, edges) -> None:
+        """
+        Helper method that replaces the contents of the graph with vertices 0 through the
+        largest index given and the (src, dst, weight) tuples in EDGES, which are read once.
+        Edges that add_edge would ignore (loops, negative indices, weights that are not
+        integers from 1 to MAX_WEIGHT) are skipped, and for duplicate edges the last weight is
+        kept, just as add_edge updates the weight of an existing edge. Only the kept edges are
+        held, in three arrays of 64-bit integers, while the storage is built. While the
+        topological order is tracked, edges that contain a cycle raise ValueError and the graph
+        is left unchanged.
+        """
+        srcs, dsts, wts = array('q'), array('q'), array('q')
+        largest = 0
+        for u, v, w in edges:
+            largest = max(largest, u, v)
+            # keeps only the edges that add_edge would accept
+            if isinstance(w, Integral) and 1 <= w <= MAX_WEIGHT and u != v and u >= 0 and v >= 0:
+                srcs.append(u)
+                dsts.append(v)
+                wts.append(w)
+        v_count = largest + 1
+
+        # builds storage of the same kind as the current one
+        previous = self.adj_matrix, self.v_count
+        self.adj_matrix = type(self.adj_matrix).from_arrays(v_count, srcs, dsts, wts)
+        self.v_count = v_count
+        self.version += 1
+
+        # the old order does not apply to the new edges, so it is computed again
+        if self.topology is not None:
+            order = self.topological_sort()
+            if len(order) < v_count:
+                self.adj_matrix, self.v_count = previous
+                self.version += 1
+                raise ValueError('edges contain a cycle while the topological order is tracked')
+            self.topology = TopologicalOrder(self, order)
+
     def add_vertex(self) -> int:
         """
         A method that adds a new vertex to the graph.
         """
-        # adds list to adjacency matrix and increments v_count
-        self.adj_matrix.append([])
-        self.v_count += 1
+        return self.add_vertices(1)
 
-        # fills out each row (list) with 0
-        for a_list in self.adj_matrix:
-            while len(a_list) < self.v_count:
-                a_list.append(0)
+    def add_vertices(self, count: int) -> int:
+        """
+        A method that adds COUNT new vertices to the graph and returns the new number of vertices.
+        The rows of the matrix are widened geometrically, so adding a vertex is O(V) amortized.
+        """
+        if count < 1:
+            return self.v_count
+
+        # grows the matrix and increments v_count
+        self.adj_matrix.add_vertices(count)
+        self.v_count += count
+        self.version += 1
+        if self.topology is not None:
+            self.topology.add_vertices(count)
         return self.v_count
 
     def add_edge(self, src: int, dst: int, weight=1) -> None:
         """
         A method that adds a new edge to the graph, connecting the two vertices with the provided
         indices. If either (or both) indices do not exist in the graph, or if the weight is not
-        a positive integer, or if src and dst refer to the same vertex, the method does nothing.
+        an integer from 1 to MAX_WEIGHT (the largest that fits in 64 bits), or if src and dst
+        refer to the same vertex, the method does nothing.
         If an edge already exists in the graph, the method will update its weight.
+        While the topological order is tracked, an edge that would create a cycle is rejected
+        and the method does nothing.
         """
         # checks conditions that do nothing from Docstrings
-        if weight < 1:
+        if not isinstance(weight, Integral) or not 1 <= weight <= MAX_WEIGHT:
             return
         if src == dst:
             return
@@ -84,9 +374,14 @@ class DirectedGraph:
             return
         if src < 0 or dst < 0:
             return
+        # updates the topological order for a new edge, which fails if it would close a cycle
+        if self.topology is not None and self.adj_matrix.get(src, dst) == 0:
+            if not self.topology.insert(src, dst):
+                return
 
         # adds vertex at position in matrix
-        self.adj_matrix[src][dst] = weight
+        self.adj_matrix.set(src, dst, weight)
+        self.version += 1
 
     def remove_edge(self, src: int, dst: int) -> None:
         """
@@ -99,21 +394,21 @@ class DirectedGraph:
             return
         if src < 0 or dst < 0:
             return
-        if self.adj_matrix[src][dst] == 0:
+        if self.adj_matrix.get(src, dst) == 0:
             return
 
         # adds 0 at position in matrix
-        self.adj_matrix[src][dst] = 0
+        self.adj_matrix.set(src, dst, 0)
+        self.version += 1
 
+    @memoized
     def get_vertices(self) -> []:
         """
         Returns a list of vertices of the graph.
         """
-        a_list = []
-        for num in range(self.v_count):
-            a_list.append(num)
-        return a_list
+        return list(range(self.v_count))
 
+    @memoized
     def get_edges(self) -> []:
         """
         Returns a list of edges in the graph. Each edge is returned as a tuple of two incident
@@ -121,19 +416,31 @@ class DirectedGraph:
         The second element in the tuple refers to the destination vertex. The third element in the
         tuple is the weight of the edge.
         """
-        # initializes edge list
-        edge_list = []
+        return list(self.iter_edges())
 
-        # iterates through matrix
-        for a_list in range(len(self.adj_matrix)):
-            for val in range(len(self.adj_matrix)):
-                # checks for edge at each position
-                if self.adj_matrix[a_list][val] != 0:
-                    # assigns weight at edge to wt
-                    wt = self.adj_matrix[a_list][val]
-                    # adds tuple to edge_list
-                    edge_list.append((a_list, val, wt))
-        return edge_list
+    def iter_edges(self):
+        """
+        A method that yields the edges of the graph one at a time, in the same order and form
+        as get_edges, without building a list.
+        """
+        # iterates through the out-edges of each vertex
+        for a_list in range(self.v_count):
+            for val, wt in self.neighbors(a_list):
+                yield a_list, val, wt
+
+    def neighbors(self, v: int) -> []:
+        """
+        Helper method that returns the out-edges of vertex V as a list of (dst, weight) tuples,
+        sorted by destination index.
+        """
+        return self.adj_matrix.neighbors(v)
+
+    def predecessors(self, v: int) -> []:
+        """
+        Helper method that returns the in-edges of vertex V as a list of (src, weight) tuples,
+        sorted by source index.
+        """
+        return self.adj_matrix.predecessors(v)
 
     def is_valid_path(self, path: []) -> bool:
         """
@@ -157,80 +464,10 @@ class DirectedGraph:
         the search will start, v_end is an optional parameter for the index of the end vertex
         that will stop the search once it is reached.
         """
-        if v_start < 0 or v_start > self.v_count:
-            return []
-
-        # initializes empty list of visited vertices and an empty stack
-        visited = []
-        stack = []
         # returns an empty list if the starting vertex is not in the graph
-        if v_start < 0 or v_start > self.v_count:
-            return visited
-
-        # adds v_start to stack
-        stack.append(v_start)
-
-        if v_end is None:
-            while len(stack) > 0:
-                vertex = stack.pop()
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # creates temp list that will store neighbors
-                    temp = []
-                    # adds neighbors to temp
-                    for val in range(len(self.adj_matrix[vertex])):
-                        if self.adj_matrix[vertex][val] != 0:
-                            temp.append(val)
-                        # sorts and reverses temp list
-                        temp.sort()
-                        temp.reverse()
-                        # appends values in reverse so that they will be popped in the correct order
-                        for num in temp:
-                            stack.append(num)
-            return visited
-
-        # proceed as if there is no end vertex
-        elif v_end < 0 or v_end > self.v_count:
-            while len(stack) > 0:
-                vertex = stack.pop()
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # creates temp list that will store neighbors
-                    temp = []
-                    # adds neighbors to temp
-                    for val in range(len(self.adj_matrix[vertex])):
-                        if self.adj_matrix[vertex][val] != 0:
-                            temp.append(val)
-                    # sorts and reverses temp list
-                    temp.sort()
-                    temp.reverse()
-                    # appends values in reverse so that they will be popped in the correct order
-                    for num in temp:
-                        stack.append(num)
-            return visited
-
-        # v_end exists
-        while len(stack) > 0:
-            vertex = stack.pop()
-            # terminates the search at v_end
-            if vertex == v_end:
-                visited.append(vertex)
-                return visited
-            if vertex not in visited:
-                visited.append(vertex)
-                # creates temp list that will store neighbors
-                temp = []
-                # adds neighbors to temp
-                for val in range(len(self.adj_matrix[vertex])):
-                    if self.adj_matrix[vertex][val] != 0:
-                        temp.append(val)
-                # sorts and reverses temp list
-                temp.sort()
-                temp.reverse()
-                # appends values in reverse so that they will be popped in the correct order
-                for num in temp:
-                    stack.append(num)
-        return visited
+        if v_start < 0 or v_start >= self.v_count:
+            return []
+        return list(dfs_order(v_start, self.successors, end_vertex(v_end)))
 
     def bfs(self, v_start, v_end=None) -> []:
         """
@@ -239,142 +476,270 @@ class DirectedGraph:
         the search will start, v_end is an optional parameter for the index of the end vertex
         that will stop the search once it is reached.
         """
+        # returns an empty list if the starting vertex is not in the graph
+        if v_start < 0 or v_start >= self.v_count:
+            return []
+        return list(bfs_order(v_start, self.successors, end_vertex(v_end)))
+
+    def iter_dfs(self, v_start, stop=None, tree=False):
+        """
+        A method that performs the same depth-first search as dfs, but yields the visited
+        vertices one at a time, so callers that only need part of the search can stop early.
+        Stop is an optional predicate that ends the search after the first vertex for which it
+        returns True. If tree is True, (vertex, parent, depth) tuples are yielded instead, where
+        parent is None for v_start.
+        """
+        # yields nothing if the starting vertex is not in the graph
+        if v_start < 0 or v_start >= self.v_count:
+            return iter(())
+        search = dfs_tree if tree else dfs_order
+        return search(v_start, self.successors, stop)
+
+    def iter_bfs(self, v_start, stop=None, tree=False):
+        """
+        A method that performs the same breadth-first search as bfs, but yields the visited
+        vertices one at a time, so callers that only need part of the search can stop early.
+        Stop is an optional predicate that ends the search after the first vertex for which it
+        returns True. If tree is True, (vertex, parent, depth) tuples are yielded instead, where
+        parent is None for v_start.
+        """
+        # yields nothing if the starting vertex is not in the graph
+        if v_start < 0 or v_start >= self.v_count:
+            return iter(())
+        search = bfs_tree if tree else bfs_order
+        return search(v_start, self.successors, stop)
+
+    @memoized
+    def adjacency_bits(self) -> tuple:
+        """
+        Helper method for bfs_levels that returns the adjacency matrix as two lists of integer
+        bitsets: bit w of out_bits[v] is set if there is an edge v -> w, and bit u of in_bits[v]
+        if there is an edge u -> v. They take at most 2 * V² bits, 1/32 of the dense matrix, so
+        they are only built for graphs stored in a DenseMatrix.
+        """
+        out_bits = [bits_from([dst for dst, _ in self.neighbors(v)], self.v_count)
+                    for v in range(self.v_count)]
+        in_bits = [bits_from([src for src, _ in self.predecessors(v)], self.v_count)
+                   for v in range(self.v_count)]
+        return out_bits, in_bits
 
-        if v_start < 0 or v_start > self.v_count:
+    def bfs_levels(self, src: int, direction_optimizing=True) -> []:
+        """
+        A method that returns the vertices reachable from SRC grouped by their distance in
+        edges: element d of the result lists, in ascending order, the vertices d edges away.
+        The search is level-synchronous on bitsets of the adjacency matrix, so a whole level is
+        expanded with big-integer operations that run in C instead of a Python loop per entry
+        of each matrix row. A top-down step ORs the out-rows of the frontier vertices, and a
+        bottom-up step keeps each unvisited vertex whose in-row meets the frontier. With
+        DIRECTION_OPTIMIZING, every level takes whichever step loops over fewer vertices, which
+        for the large middle levels of a search is the bottom-up one.
+        Graphs stored in compressed sparse rows, for which the bitsets would take far more
+        memory than the edges, run the same steps on the edge arrays instead.
+        Returns an empty list if SRC is not in the graph.
+        """
+        if not 0 <= src < self.v_count:
             return []
+        if not isinstance(self.adj_matrix, DenseMatrix):
+            return self.csr_levels(src, direction_optimizing)
+        out_bits, in_bits = self.adjacency_bits()
 
-        # initializes empty list of visited vertices and an empty stack
-        visited = []
-        queue = []
-        # returns an empty list if the starting vertex is not in the graph
-        if v_start < 0 or v_start > self.v_count:
-            return visited
-
-        # adds v_start to stack
-        queue.append(v_start)
-
-        if v_end is None:
-            while len(queue) > 0:
-                vertex = queue.pop(0)
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # creates temp list that will store neighbors
-                    temp = []
-                    # adds neighbors to temp
-                    for val in range(len(self.adj_matrix[vertex])):
-                        if self.adj_matrix[vertex][val] != 0:
-                            temp.append(val)
-                        # sorts and reverses temp list
-                        temp.sort()
-                        # appends values in reverse so that they will be popped in the correct order
-                        for num in temp:
-                            if num not in visited:
-                                queue.append(num)
-            return visited
-
-        # proceed as if there is no end vertex
-        elif v_end < 0 or v_end > self.v_count:
-            while len(queue) > 0:
-                vertex = queue.pop(0)
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # creates temp list that will store neighbors
-                    temp = []
-                    # adds neighbors to temp
-                    for val in range(len(self.adj_matrix[vertex])):
-                        if self.adj_matrix[vertex][val] != 0:
-                            temp.append(val)
-                    # sorts and reverses temp list
-                    temp.sort()
-                    # appends values in reverse so that they will be popped in the correct order
-                    for num in temp:
-                        if num not in visited:
-                            queue.append(num)
-            return visited
-
-        # v_end exists
-        while len(queue) > 0:
-            vertex = queue.pop(0)
-            # terminates the search at v_end
-            if vertex == v_end:
-                visited.append(vertex)
-                return visited
-            if vertex not in visited:
-                visited.append(vertex)
-                # creates temp list that will store neighbors
-                temp = []
-                # adds neighbors to temp
-                for val in range(len(self.adj_matrix[vertex])):
-                    if self.adj_matrix[vertex][val] != 0:
-                        temp.append(val)
-                # sorts and reverses temp list
-                temp.sort()
-                # appends values in reverse so that they will be popped in the correct order
-                for num in temp:
-                    if num not in visited:
-                        queue.append(num)
-        return visited
+        visited = frontier = 1 << src
+        unvisited = ((1 << self.v_count) - 1) ^ visited
+        levels = [[src]]
+        while True:
+            if not direction_optimizing or len(levels[-1]) <= unvisited.bit_count():
+                # top-down: everything the frontier points to that is not yet visited
+                reached = 0
+                for v in levels[-1]:
+                    reached |= out_bits[v]
+                level = bit_positions(reached & unvisited)
+            else:
+                # bottom-up: every unvisited vertex with an in-edge from the frontier
+                level = [v for v in bit_positions(unvisited) if in_bits[v] & frontier]
+            if len(level) == 0:
+                return levels
+            frontier = bits_from(level, self.v_count)
+            visited |= frontier
+            unvisited ^= frontier
+            levels.append(level)
 
+    def csr_levels(self, src: int, direction_optimizing: bool) -> []:
+        """
+        Helper method for bfs_levels on a CSRMatrix. A top-down step scans the out-edges of the
+        frontier, and a bottom-up step scans the in-edges of each unvisited vertex until one
+        comes from the frontier, with bytearrays marking visited and frontier vertices.
+        """
+        matrix = self.adj_matrix
+        # builds the reversed edges if they are not stored yet
+        matrix.predecessors(src)
+        offsets, targets = matrix.offsets, matrix.targets
+        in_offsets, in_targets = matrix.transpose.offsets, matrix.transpose.targets
+
+        visited = bytearray(self.v_count)
+        visited[src] = 1
+        unvisited = self.v_count - 1
+        levels = [[src]]
+        while True:
+            if not direction_optimizing or len(levels[-1]) <= unvisited:
+                # top-down: everything the frontier points to that is not yet visited
+                level = []
+                for v in levels[-1]:
+                    for w in targets[offsets[v]:offsets[v + 1]]:
+                        if not visited[w]:
+                            visited[w] = 1
+                            level.append(w)
+                level.sort()
+            else:
+                # bottom-up: every unvisited vertex with an in-edge from the frontier
+                frontier = bytearray(self.v_count)
+                for v in levels[-1]:
+                    frontier[v] = 1
+                level = [w for w in range(self.v_count) if not visited[w] and
+                         any(frontier[u] for u in in_targets[in_offsets[w]:in_offsets[w + 1]])]
+                for w in level:
+                    visited[w] = 1
+            if len(level) == 0:
+                return levels
+            unvisited -= len(level)
+            levels.append(level)
+
+    def bfs_distances(self, src: int, direction_optimizing=True) -> []:
+        """
+        A method that returns a list with the number of edges on a shortest path from SRC to
+        each vertex (infinity if a vertex is not reachable), computed by bfs_levels. Returns an
+        empty list if SRC is not in the graph.
+        """
+        if not 0 <= src < self.v_count:
+            return []
+        distances = [float("inf")] * self.v_count
+        for depth, level in enumerate(self.bfs_levels(src, direction_optimizing)):
+            for v in level:
+                distances[v] = depth
+        return distances
+
+    def predecessor_list(self, v: int) -> []:
+        """
+        Helper method that returns the indices of the in-neighbors of vertex V in ascending
+        order.
+        """
+        return [src for src, _ in self.predecessors(v)]
+
+    def successors(self, v: int) -> []:
+        """
+        Helper method for the traversals that returns the indices of the out-neighbors of
+        vertex V in ascending order.
+        """
+        return [dst for dst, _ in self.neighbors(v)]
+
+    @memoized
     def has_cycle(self):
         """
         A method that returns True if graph contains a cycle; False otherwise.
         """
-        pass
-        if self.v_count == 0:
+        # a tracked topological order guarantees that there is no cycle
+        if self.topology is not None:
             return False
+        return len(self.find_cycle()) > 0
 
-        # checks for a cycle between two vertices with edges pointing to each other
-        for li in range(self.v_count):
-            for col in range(self.v_count):
-                if self.adj_matrix[li][col] != 0:
-                    if self.adj_matrix[col][li] != 0:
-                        return True
+    def track_topological_order(self) -> bool:
+        """
+        A method that starts maintaining a topological order of the graph, updated locally on
+        every add_edge instead of being recomputed, and used to reject edges that would create
+        a cycle. Returns False (and tracks nothing) if the graph already has a cycle.
+        """
+        if self.topology is None:
+            order = self.topological_sort()
+            if len(order) < self.v_count:
+                return False
+            self.topology = TopologicalOrder(self, order)
+        return True
 
+    @memoized
+    def topological_order(self) -> []:
+        """
+        A method that returns the vertices in topological order (every edge goes from an
+        earlier to a later vertex), or an empty list if the graph has a cycle. While the order
+        is tracked it is returned without recomputation.
+        """
+        if self.topology is not None:
+            return self.topology.order
+        order = self.topological_sort()
+        return order if len(order) == self.v_count else []
+
+    def topological_sort(self) -> []:
+        """
+        Helper method that runs Kahn's algorithm in O(V + E). Returns the vertices that could
+        be ordered, which is fewer than v_count when the graph has a cycle.
+        """
+        # counts incoming edges of every vertex
+        in_degree = [0] * self.v_count
+        for v in range(self.v_count):
+            for val, _ in self.neighbors(v):
+                in_degree[val] += 1
+
+        # repeatedly takes a vertex with no remaining incoming edges
+        queue = deque(v for v in range(self.v_count) if in_degree[v] == 0)
+        order = []
+        while len(queue) > 0:
+            v = queue.popleft()
+            order.append(v)
+            for val, _ in self.neighbors(v):
+                in_degree[val] -= 1
+                if in_degree[val] == 0:
+                    queue.append(val)
+        return order
+
+    def find_cycle(self) -> []:
+        """
+        A method that returns the vertices of a cycle in the graph, in edge order (the last
+        vertex has an edge back to the first), or an empty list if the graph has no cycle.
+        All searches share one coloring of the vertices, so each vertex and edge is examined
+        at most once and the whole check is O(V + E).
+        """
+        # 0 = not visited yet, 1 = on the current search path, 2 = finished
+        color = bytearray(self.v_count)
         for vertex in range(self.v_count):
-            # calls helper cycle_dfs on vertex and returns True if a cycle is found
-            if self.cycle_dfs(vertex) is True:
-                return True
-        return False
+            if color[vertex] == 0:
+                # calls helper cycle_dfs on vertex and returns the cycle if one is found
+                cycle = self.cycle_dfs(vertex, color)
+                if len(cycle) > 0:
+                    return cycle
+        return []
 
-    def cycle_dfs(self, v_start):
+    def cycle_dfs(self, v_start, color=None) -> []:
         """
-        Helper method for has_cycle, using DFS algorithm. Returns True if a cycle is found, and
-        False otherwise.
+        Helper method for find_cycle, using DFS algorithm. Returns the vertices of a cycle
+        reachable from v_start, or an empty list if there is none. COLOR marks vertices as not
+        visited (0), on the current search path (1) or finished (2); it can be shared between
+        calls so that finished vertices are never searched again. An edge to a vertex on the
+        current path closes a cycle.
         """
-        # initializes empty list of visited vertices and an empty stack
-        visited = []
-        stack = []
-        # returns an empty list if the starting vertex is not in the graph
-        if v_start < 0 or v_start > self.v_count:
-            return visited
+        if color is None:
+            color = bytearray(self.v_count)
+        # returns an empty list if the starting vertex is not in the graph or already searched
+        if v_start < 0 or v_start >= self.v_count or color[v_start] != 0:
+            return []
 
-        # adds v_start to stack
-        stack.append((v_start, None))
+        # path holds the current search path, stack the unexplored neighbors of each vertex on it
+        color[v_start] = 1
+        path = [v_start]
+        stack = [iter(self.successors(v_start))]
 
         while len(stack) > 0:
-            # sets tuple to vertex and parent
-            vertex, parent = stack.pop()
-
-            if vertex not in visited:
-                visited.append(vertex)
-                # creates temp list that will store neighbors
-                temp = []
-                # adds neighbors to temp
-                for val in range(len(self.adj_matrix[vertex])):
-                    if self.adj_matrix[vertex][val] != 0:
-                        temp.append(val)
-                # sorts and reverses temp list
-                temp.sort(reverse=True)
-                for val in temp:
-                    # conditions for cycle
-                    if val in visited and val != parent:
-                        for h in self.adj_matrix[val]:
-                            # must have outgoing edge
-                            if h != 0:
-                                return True
-                    # adds tuple to stack consisting of val and vertex as new parent
-                    stack.append((val, vertex))
-        return False
+            for val in stack[-1]:
+                if color[val] == 1:
+                    # the path from val to the current vertex plus this edge is a cycle
+                    return path[path.index(val):]
+                if color[val] == 0:
+                    color[val] = 1
+                    path.append(val)
+                    stack.append(iter(self.successors(val)))
+                    break
+            else:
+                # all neighbors explored, so the vertex is finished
+                stack.pop()
+                color[path.pop()] = 2
+        return []
 
     def dijkstra(self, src: int) -> []:
         """
@@ -387,6 +752,14 @@ class DirectedGraph:
         Citation: I consulted a tutor on how to initializing the distances dictionary with each
         value set to float("inf"), as well as the first conditional statement in the while loop.
         """
+        # small integer weights are searched with a bucket queue instead of the heap below
+        max_weight = self.max_weight()
+        if max_weight <= DELTA_MAX_WEIGHT:
+            distances = [float("inf")] * self.v_count
+            fill = self.distance_engine(max_weight)
+            fill([src], distances, self.adj_matrix.neighbors)
+            return distances
+
         # initializes dictionary for distances and sets default distance to float("inf")
         distances = {}
         for num in range(self.v_count):
@@ -406,16 +779,15 @@ class DirectedGraph:
 
             # checks whether dist is less than the current distance
             if dist <= distances[v]:
-                for val in range(len(self.adj_matrix[v])):
-                    # if there is an edge between v and val
-                    if self.adj_matrix[v][val] != 0:
-                        # sets new dist_2 variable to dist + weight of current edge
-                        dist_2 = dist + self.adj_matrix[v][val]
-                        # sets distance to dist_2 if the path is shorter
-                        if dist_2 < distances[val]:
-                            distances[val] = dist_2
-                            # pushes tuple to hq
-                            heapq.heappush(hq, (dist_2, val))
+                # for each edge between v and val
+                for val, wt in self.neighbors(v):
+                    # sets new dist_2 variable to dist + weight of current edge
+                    dist_2 = dist + wt
+                    # sets distance to dist_2 if the path is shorter
+                    if dist_2 < distances[val]:
+                        distances[val] = dist_2
+                        # pushes tuple to hq
+                        heapq.heappush(hq, (dist_2, val))
 
         # returns list of shortest paths
         ret_list = []
@@ -423,6 +795,1291 @@ class DirectedGraph:
             ret_list.append(distances[key])
         return ret_list
 
+    def dijkstra_many(self, sources: [], nearest=False, reverse=False) -> 'DistanceMatrix':
+        """
+        Computes shortest path lengths from every vertex in SOURCES in one batch and returns
+        them as a DistanceMatrix with one row per source and one column per vertex (infinity
+        where a vertex is not reachable). The out-edges of each vertex are gathered once for the
+        whole batch and every search writes straight into its row of the result, so no per-call
+        dictionaries or lists are allocated. If NEAREST is True, all sources are searched
+        together as a single super-source and the result has one row holding the distance from
+        each vertex's nearest source. If REVERSE is True, the searches follow edges backwards,
+        so entry (i, v) is the distance from vertex v to the i-th source instead.
+        Assumes that all sources are valid vertices.
+        """
+        # gathers the out-edges (or in-edges) of every vertex once for all searches
+        edges = self.predecessors if reverse else self.neighbors
+        adj = [edges(v) for v in range(self.v_count)]
+        fill = self.distance_engine(self.max_weight())
+
+        if nearest:
+            table = DistanceMatrix(1, self.v_count)
+            fill(sources, table.view(0), adj.__getitem__)
+            return table
+
+        table = DistanceMatrix(len(sources), self.v_count)
+        for i, src in enumerate(sources):
+            fill([src], table.view(i), adj.__getitem__)
+        return table
+
+    @staticmethod
+    def dijkstra_fill(sources: [], distances, neighbors) -> None:
+        """
+        Helper method for dijkstra_many and all_pairs_shortest_paths that runs Dijkstra from
+        all SOURCES at once (each at distance 0) and writes the shortest path lengths into
+        DISTANCES, a buffer of v_count floats that must be filled with infinity. NEIGHBORS is a
+        function returning the out-edges of a vertex as (dst, weight) tuples.
+        """
+        hq = []
+        for src in sources:
+            distances[src] = 0.0
+            hq.append((0.0, src))
+        heapq.heapify(hq)
+
+        while len(hq) > 0:
+            dist, v = heapq.heappop(hq)
+            # skips entries for vertices that were already reached by a shorter path
+            if dist > distances[v]:
+                continue
+            for val, wt in neighbors(v):
+                dist_2 = dist + wt
+                if dist_2 < distances[val]:
+                    distances[val] = dist_2
+                    heapq.heappush(hq, (dist_2, val))
+
+    @memoized
+    def max_weight(self) -> int:
+        """
+        Helper method that returns the largest edge weight in the graph (0 if it has no edges)
+        """
+        return self.adj_matrix.max_weight()
+
+    @staticmethod
+    def distance_engine(max_weight: int):
+        """
+        Helper method that picks how Dijkstra searches a graph whose edge weights are integers
+        from 1 to MAX_WEIGHT, and returns it as a function taking the same arguments as
+        dijkstra_fill. Small ranges use Dial's bucket queue, larger ones delta-stepping with
+        buckets of width MAX_WEIGHT / 8, and only wide ranges fall back to the binary heap.
+        """
+        if max_weight <= DIAL_MAX_WEIGHT:
+            return functools.partial(DirectedGraph.dial_fill, max_weight=max_weight)
+        if max_weight <= DELTA_MAX_WEIGHT:
+            return functools.partial(DirectedGraph.delta_stepping_fill, delta=max_weight // 8,
+                                     max_weight=max_weight)
+        return DirectedGraph.dijkstra_fill
+
+    @staticmethod
+    def dial_fill(sources: [], distances, neighbors, max_weight: int) -> None:
+        """
+        Helper method that computes the same distances as dijkstra_fill with Dial's algorithm.
+        Vertices wait in a circular array of MAX_WEIGHT + 1 buckets, one per distance, so each
+        queue operation is a list append or pop with no comparisons or tuples, and a search
+        takes O(E + D) time, where D <= V * MAX_WEIGHT is the largest distance found. An edge
+        heavier than MAX_WEIGHT does not fit the buckets, so the search is then redone with
+        the heap.
+        """
+        size = max_weight + 1
+        buckets = [[] for _ in range(size)]
+        for src in sources:
+            distances[src] = 0
+            buckets[0].append(src)
+
+        # every distance from 0 up is visited in turn until no vertex is waiting
+        pending = len(sources)
+        dist = 0
+        while pending > 0:
+            bucket = buckets[dist % size]
+            while len(bucket) > 0:
+                v = bucket.pop()
+                pending -= 1
+                # skips entries for vertices that were since reached by a shorter path
+                if distances[v] != dist:
+                    continue
+                for val, wt in neighbors(v):
+                    dist_2 = dist + wt
+                    if dist_2 < distances[val]:
+                        # a heavier edge would wrap around the circular array
+                        if wt > max_weight:
+                            DirectedGraph.restart_with_heap(sources, distances, neighbors)
+                            return
+                        distances[val] = dist_2
+                        buckets[dist_2 % size].append(val)
+                        pending += 1
+            dist += 1
+
+    @staticmethod
+    def delta_stepping_fill(sources: [], distances, neighbors, delta: int,
+                            max_weight: int) -> None:
+        """
+        Helper method that computes the same distances as dijkstra_fill with delta-stepping.
+        Bucket i holds the vertices at distances [i * DELTA, (i + 1) * DELTA), so far fewer
+        buckets are scanned than with Dial's algorithm when weights are large. Each bucket is
+        processed as a batch: light edges (weight <= DELTA) are relaxed round by round until
+        the bucket stays empty, then the heavy edges found on the way are relaxed at once.
+        As in dial_fill, an edge heavier than MAX_WEIGHT makes it redo the search with the heap.
+        """
+        # distances may be stored as floats, so bucket indices are converted with int
+        size = max_weight // delta + 2
+        buckets = [[] for _ in range(size)]
+        for src in sources:
+            distances[src] = 0
+            buckets[0].append(src)
+
+        pending = len(sources)
+        i = 0
+        while pending > 0:
+            slot = i % size
+            heavy = []
+            # light edges can put vertices back into the current bucket
+            while len(buckets[slot]) > 0:
+                current = buckets[slot]
+                buckets[slot] = []
+                pending -= len(current)
+                frontier = {v for v in current if distances[v] // delta == i}
+                for v in frontier:
+                    for val, wt in neighbors(v):
+                        # heavy edges always lead to a later bucket, so they wait until the end
+                        if wt > delta:
+                            heavy.append((v, val, wt))
+                            continue
+                        dist_2 = distances[v] + wt
+                        if dist_2 < distances[val]:
+                            distances[val] = dist_2
+                            buckets[int(dist_2 // delta) % size].append(val)
+                            pending += 1
+            # the bucket is settled, so each heavy edge is relaxed from a final distance
+            for v, val, wt in heavy:
+                dist_2 = distances[v] + wt
+                if dist_2 < distances[val]:
+                    # a heavier edge would wrap around the circular array
+                    if wt > max_weight:
+                        DirectedGraph.restart_with_heap(sources, distances, neighbors)
+                        return
+                    distances[val] = dist_2
+                    buckets[int(dist_2 // delta) % size].append(val)
+                    pending += 1
+            i += 1
+
+    @staticmethod
+    def restart_with_heap(sources: [], distances, neighbors) -> None:
+        """
+        Helper method for the bucket queues that clears DISTANCES and runs dijkstra_fill
+        instead, for a search that meets an edge heavier than the MAX_WEIGHT its buckets were
+        sized for
+        """
+        for v in range(len(distances)):
+            distances[v] = float("inf")
+        DirectedGraph.dijkstra_fill(sources, distances, neighbors)
+
+    def all_pairs_shortest_paths(self, workers=None, typecode='f', path=None,
+                                 method='dijkstra') -> 'DistanceMatrix':
+        """
+        A method that computes the length of the shortest path between every pair of vertices
+        and returns it as a v_count x v_count DistanceMatrix, where entry (i, v) equals
+        dijkstra(i)[v]. The table is allocated once, as float32 by default (exact for path
+        lengths up to 2 ** 24; pass TYPECODE 'd' for doubles), and backed by a memory-mapped
+        file if PATH is given, so tables larger than memory can be written to disk.
+        Sources are split into shards that run Dijkstra in a pool of WORKERS processes (by
+        default all cores, for graphs of at least PARALLEL_MIN_VERTICES vertices, and none for
+        smaller ones). The graph is copied once into shared memory as CSR arrays, and the table
+        itself is allocated in shared memory (or is the mapped file), so each worker writes its
+        rows straight into the result and nothing is pickled or copied per source.
+        METHOD 'floyd' runs Floyd–Warshall in this process instead, whose inner loop over a row
+        runs in C. Even on complete graphs its O(V³) passes are slower than V heap searches,
+        so it is only used when asked for.
+        """
+        v_count = self.v_count
+        if workers is None:
+            workers = (os.cpu_count() or 1) if v_count >= PARALLEL_MIN_VERTICES else 1
+        workers = min(workers, v_count)
+        parallel = method != 'floyd' and workers > 1
+        table = DistanceMatrix(v_count, v_count, typecode, path, parallel and path is None)
+
+        if method == 'floyd':
+            self.floyd_warshall_fill(table, [self.neighbors(v) for v in range(v_count)])
+            return table
+        if not parallel:
+            adj = [self.neighbors(v) for v in range(v_count)]
+            fill = self.distance_engine(self.max_weight())
+            for src in range(v_count):
+                distances = array('d', [float("inf")]) * v_count
+                fill([src], distances, adj.__getitem__)
+                table.view(src)[:] = array(typecode, distances)
+            return table
+
+        # shares the CSR arrays; the table is already shared memory or a file mapping
+        matrix = self.freeze().adj_matrix
+        graph_block, layout = share_arrays([matrix.offsets, matrix.targets, matrix.weights])
+        out_name = table.block.name if table.block is not None else None
+        try:
+            # several shards per worker even out the differences in search cost
+            shards = workers * 4
+            bounds = [v_count * i // shards for i in range(shards + 1)]
+            with ProcessPoolExecutor(workers) as pool:
+                jobs = [pool.submit(dijkstra_shard, graph_block.name, layout, v_count, out_name,
+                                    path, typecode, range(bounds[i], bounds[i + 1]))
+                        for i in range(shards) if bounds[i] < bounds[i + 1]]
+                for job in jobs:
+                    job.result()
+        finally:
+            graph_block.close()
+            graph_block.unlink()
+            # the table stays mapped here, but no other process needs its name any more
+            if table.block is not None:
+                table.block.unlink()
+        return table
+
+    @staticmethod
+    def floyd_warshall_fill(table: 'DistanceMatrix', adj: []) -> None:
+        """
+        Helper method for all_pairs_shortest_paths that runs Floyd–Warshall on the out-edges
+        in ADJ and writes the result into TABLE. Each pass relaxes a whole row at once with
+        map, so the O(V³) inner loop runs in C rather than in Python.
+        """
+        v_count = len(adj)
+        dist = []
+        for v in range(v_count):
+            row = [float("inf")] * v_count
+            for dst, wt in adj[v]:
+                row[dst] = float(wt)
+            row[v] = 0.0
+            dist.append(row)
+
+        for k in range(v_count):
+            row_k = dist[k]
+            for i in range(v_count):
+                d_ik = dist[i][k]
+                # rows that cannot reach k, and row k itself, cannot improve through k
+                if d_ik == float("inf") or i == k:
+                    continue
+                dist[i] = list(map(min, dist[i], map(add, row_k, repeat(d_ik))))
+
+        for i in range(v_count):
+            table.view(i)[:] = array(table.typecode, dist[i])
+
+    def shortest_path(self, src: int, dst: int, bidirectional=False) -> tuple:
+        """
+        A method that finds a shortest path from vertex SRC to vertex DST and returns it as a
+        tuple (path, cost), where path is the list of vertices from src to dst. Unlike dijkstra,
+        the search stops as soon as dst is settled. If bidirectional is True, a second search
+        runs backwards from dst over the in-edges and the two stop once they meet, which
+        settles far fewer vertices on large sparse graphs. If dst is not reachable from src
+        (or either vertex is not in the graph), returns ([], infinity).
+        """
+        if not 0 <= src < self.v_count or not 0 <= dst < self.v_count:
+            return [], float("inf")
+        if bidirectional:
+            return self.bidirectional_search(src, dst)
+
+        # tracks best known distance and the vertex each one was reached from
+        distances = {src: 0}
+        previous = {src: None}
+        hq = [(0, src)]
+
+        while len(hq) > 0:
+            dist, v = heapq.heappop(hq)
+            if dist > distances[v]:
+                continue
+            # dst is settled, so its distance is final
+            if v == dst:
+                return trace_path(previous, dst), dist
+            for val, wt in self.neighbors(v):
+                dist_2 = dist + wt
+                if dist_2 < distances.get(val, float("inf")):
+                    distances[val] = dist_2
+                    previous[val] = v
+                    heapq.heappush(hq, (dist_2, val))
+        return [], float("inf")
+
+    def bidirectional_search(self, src: int, dst: int) -> tuple:
+        """
+        Helper method for shortest_path that runs Dijkstra forwards from SRC and backwards
+        from DST, always expanding the side with the smaller queue. The search stops once the
+        smallest distances left in both queues add up to at least the best path found so far.
+        """
+        forward = ({src: 0}, {src: None}, [(0, src)], self.neighbors)
+        backward = ({dst: 0}, {dst: None}, [(0, dst)], self.predecessors)
+        best, meet = (0, src) if src == dst else (float("inf"), None)
+
+        while len(forward[2]) > 0 and len(backward[2]) > 0:
+            if forward[2][0][0] + backward[2][0][0] >= best:
+                break
+            if len(forward[2]) <= len(backward[2]):
+                side, other = forward, backward
+            else:
+                side, other = backward, forward
+            distances, previous, hq, edges = side
+
+            dist, v = heapq.heappop(hq)
+            if dist > distances[v]:
+                continue
+            for val, wt in edges(v):
+                dist_2 = dist + wt
+                if dist_2 < distances.get(val, float("inf")):
+                    distances[val] = dist_2
+                    previous[val] = v
+                    heapq.heappush(hq, (dist_2, val))
+                    # checks whether the two searches now meet at val with a shorter path
+                    if val in other[0] and dist_2 + other[0][val] < best:
+                        best, meet = dist_2 + other[0][val], val
+
+        if meet is None:
+            return [], float("inf")
+
+        # joins the forward path to meet with the backward path from meet to dst
+        path = trace_path(forward[1], meet)
+        v = backward[1][meet]
+        while v is not None:
+            path.append(v)
+            v = backward[1][v]
+        return path, best
+
+    def astar(self, src: int, dst: int, heuristic=None) -> tuple:
+        """
+        A method that finds a shortest path from vertex SRC to vertex DST with A* search and
+        returns it as a tuple (path, cost), like shortest_path. HEURISTIC is a function
+        heuristic(v, dst) that returns a lower bound on the distance from v to dst, such as a
+        Landmarks object built for this graph; vertices are settled in order of distance plus
+        estimate, so a good bound settles far fewer vertices than Dijkstra. Without a
+        heuristic the search is the same as shortest_path. If dst is not reachable from src
+        (or either vertex is not in the graph), returns ([], infinity).
+        """
+        if not 0 <= src < self.v_count or not 0 <= dst < self.v_count:
+            return [], float("inf")
+        if heuristic is None:
+            return self.shortest_path(src, dst)
+
+        # tracks best known distance and the vertex each one was reached from
+        distances = {src: 0}
+        previous = {src: None}
+        hq = [(heuristic(src, dst), 0, src)]
+
+        while len(hq) > 0:
+            _, dist, v = heapq.heappop(hq)
+            if dist > distances[v]:
+                continue
+            # dst is settled, so its distance is final
+            if v == dst:
+                return trace_path(previous, dst), dist
+            for val, wt in self.neighbors(v):
+                dist_2 = dist + wt
+                if dist_2 < distances.get(val, float("inf")):
+                    estimate = heuristic(val, dst)
+                    # vertices that cannot reach dst are never queued
+                    if estimate == float("inf"):
+                        continue
+                    distances[val] = dist_2
+                    previous[val] = v
+                    heapq.heappush(hq, (dist_2 + estimate, dist_2, val))
+        return [], float("inf")
+
+
+class TopologicalOrder:
+    """
+    Topological order of an acyclic DirectedGraph, maintained under edge insertions with the
+    Pearce-Kelly algorithm. When a new edge src -> dst goes backwards in the order, only the
+    vertices positioned between dst and src that are reachable from dst, or that reach src,
+    are searched and moved, and reaching src from dst means the edge would close a cycle.
+    Removing an edge never breaks the order, so removals need no update.
+    """
+
+    def __init__(self, graph: DirectedGraph, order: []):
+        """
+        Starts from ORDER, a valid topological order of all vertices of GRAPH
+        """
+        self.graph = graph
+        self.order = order
+        self.position = [0] * len(order)
+        for i, v in enumerate(order):
+            self.position[v] = i
+
+    def add_vertices(self, count: int) -> None:
+        """
+        Places COUNT new vertices with no edges at the end of the order
+        """
+        for _ in range(count):
+            self.position.append(len(self.order))
+            self.order.append(len(self.order))
+
+    def insert(self, src: int, dst: int) -> bool:
+        """
+        Updates the order for a new edge src -> dst. Returns False and leaves the order as it
+        was if the edge would create a cycle.
+        """
+        position = self.position
+        lower, upper = position[dst], position[src]
+        if lower > upper:
+            return True
+
+        # vertices reachable from dst that are not after src; finding src means a cycle
+        forward = self.search(dst, self.graph.successors, lambda v: position[v] <= upper)
+        if src in forward:
+            return False
+        # vertices that reach src and are not before dst
+        backward = self.search(src, self.graph.predecessor_list, lambda v: position[v] >= lower)
+
+        # moves the vertices reaching src ahead of those reachable from dst, reusing the
+        # positions they occupied between them
+        backward.sort(key=position.__getitem__)
+        forward.sort(key=position.__getitem__)
+        moved = backward + forward
+        slots = sorted(position[v] for v in moved)
+        for v, i in zip(moved, slots):
+            position[v] = i
+            self.order[i] = v
+        return True
+
+    @staticmethod
+    def search(v_start: int, edges, inside) -> []:
+        """
+        Returns the vertices reachable from v_start through EDGES that satisfy INSIDE
+        """
+        visited = {v_start}
+        stack = [v_start]
+        while len(stack) > 0:
+            for val in edges(stack.pop()):
+                if val not in visited and inside(val):
+                    visited.add(val)
+                    stack.append(val)
+        return list(visited)
+
+
+class Landmarks:
+    """
+    ALT heuristic for DirectedGraph.astar, built from precomputed shortest path lengths
+    from and to a few landmark vertices. By the triangle inequality,
+    d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L) for every landmark L,
+    and the largest of these bounds is used as the estimate. The distances describe the
+    graph at the time they were computed, so they must be rebuilt after edges change.
+    """
+
+    def __init__(self, graph: DirectedGraph, landmarks=4):
+        """
+        Precomputes distances for LANDMARKS, either a list of vertices or the number of
+        landmarks to pick (spread out by choosing each one farthest from those already picked)
+        """
+        # a graph in concurrency mode is held for reading, so all searches see the same edges
+        with reading(graph.lock):
+            if isinstance(landmarks, int):
+                landmarks = self.select(graph, landmarks)
+            self.landmarks = list(landmarks)
+            # from_landmark[i, v] = d(L_i, v) and to_landmark[i, v] = d(v, L_i)
+            self.from_landmark = graph.dijkstra_many(self.landmarks)
+            self.to_landmark = graph.dijkstra_many(self.landmarks, reverse=True)
+
+    @staticmethod
+    def select(graph: DirectedGraph, count: int) -> []:
+        """
+        Picks up to COUNT landmarks, starting at vertex 0 and then repeatedly taking the vertex
+        farthest from all landmarks picked so far (unreachable vertices start a new region)
+        """
+        if graph.v_count == 0:
+            return []
+        chosen = [0]
+        while len(chosen) < min(count, graph.v_count):
+            nearest = graph.dijkstra_many(chosen, nearest=True).row(0)
+            farthest = max((v for v in range(graph.v_count) if v not in chosen),
+                           key=nearest.__getitem__)
+            chosen.append(farthest)
+        return chosen
+
+    def __call__(self, v: int, dst: int) -> float:
+        """
+        Returns a lower bound on the distance from v to dst, infinity if dst is unreachable
+        """
+        inf = float("inf")
+        cols = self.from_landmark.cols
+        forward, backward = self.from_landmark.data, self.to_landmark.data
+        best = 0
+        for i in range(len(self.landmarks)):
+            from_v, from_dst = forward[i * cols + v], forward[i * cols + dst]
+            to_v, to_dst = backward[i * cols + v], backward[i * cols + dst]
+            # if L reaches v but not dst, or dst reaches L but v does not, v cannot reach dst
+            if from_v < inf <= from_dst or to_dst < inf <= to_v:
+                return inf
+            if from_dst < inf and from_dst - from_v > best:
+                best = from_dst - from_v
+            if to_v < inf and to_v - to_dst > best:
+                best = to_v - to_dst
+        return best
+
+
+class ContractionHierarchy:
+    """
+    Preprocessed form of a DirectedGraph for fast point-to-point shortest path queries.
+    Vertices are contracted one at a time in order of importance (rank). Contracting v
+    removes it and adds a shortcut u -> x for each path u -> v -> x that is the only shortest
+    route between its ends among the remaining vertices. A query then runs Dijkstra forward
+    from the source and backward from the destination, both only along edges to higher-ranked
+    vertices, and the two meet at the highest vertex of a shortest path. The searches settle
+    a few hundred vertices even on large road networks, and give the same distances as
+    dijkstra. The hierarchy describes the graph at the time it was built, so it must be
+    rebuilt after edges change; graph_io.save_hierarchy stores it for later queries.
+    """
+
+    # settled vertices after which a witness search gives up and keeps the shortcut
+    WITNESS_LIMIT = 100
+
+    def __init__(self, graph: DirectedGraph = None):
+        """
+        Builds the hierarchy for GRAPH (an empty hierarchy if no graph is given)
+        """
+        self.v_count = 0
+        # rank[v] is the position of v in the contraction order
+        self.rank = array('i')
+        # up holds the edges v -> x with rank[x] > rank[v] in row v, down holds the edges
+        # u -> v with rank[u] > rank[v] as (u, weight) in row v, and via holds the vertex each
+        # shortcut bypasses (-1 for edges of the graph) in the same positions as the targets
+        self.up, self.up_via = CSRMatrix(), array('i')
+        self.down, self.down_via = CSRMatrix(), array('i')
+
+        if graph is not None:
+            # a graph in concurrency mode is held for reading while its edges are copied
+            with reading(graph.lock):
+                self.build(graph)
+
+    def build(self, graph: DirectedGraph) -> None:
+        """
+        Helper method that contracts every vertex of GRAPH and stores the resulting edges.
+        The next vertex is the one with the smallest edge difference (shortcuts added minus
+        edges removed) plus the number of its neighbors already contracted, which spreads
+        contraction evenly over the graph. Priorities change as neighbors are contracted, so
+        they are recomputed lazily when a vertex reaches the top of the queue.
+        """
+        v_count = graph.v_count
+        # edges among the vertices not yet contracted, as {neighbor: (weight, via)}
+        out_edges = [{dst: (wt, -1) for dst, wt in graph.neighbors(v)} for v in range(v_count)]
+        in_edges = [dict() for _ in range(v_count)]
+        for v in range(v_count):
+            for dst, (wt, via) in out_edges[v].items():
+                in_edges[dst][v] = (wt, via)
+
+        contracted_neighbors = [0] * v_count
+        rank = array('i', [0]) * v_count
+        up_rows, down_rows = [None] * v_count, [None] * v_count
+
+        def priority(v: int, shortcuts: []) -> int:
+            return (len(shortcuts) - len(in_edges[v]) - len(out_edges[v])
+                    + contracted_neighbors[v])
+
+        hq = [(priority(v, self.shortcuts(v, in_edges, out_edges)), v) for v in range(v_count)]
+        heapq.heapify(hq)
+        order = 0
+        while len(hq) > 0:
+            _, v = heapq.heappop(hq)
+            # puts v back if its priority has grown past the next vertex
+            shortcuts = self.shortcuts(v, in_edges, out_edges)
+            current = priority(v, shortcuts)
+            if len(hq) > 0 and current > hq[0][0]:
+                heapq.heappush(hq, (current, v))
+                continue
+
+            rank[v] = order
+            order += 1
+            # every remaining neighbor is contracted later, so it ranks above v
+            up_rows[v] = sorted((dst, wt, via) for dst, (wt, via) in out_edges[v].items())
+            down_rows[v] = sorted((src, wt, via) for src, (wt, via) in in_edges[v].items())
+            for src in in_edges[v]:
+                del out_edges[src][v]
+                contracted_neighbors[src] += 1
+            for dst in out_edges[v]:
+                del in_edges[dst][v]
+                contracted_neighbors[dst] += 1
+            for src, dst, wt in shortcuts:
+                if wt < out_edges[src].get(dst, (float("inf"),))[0]:
+                    out_edges[src][dst] = (wt, v)
+                    in_edges[dst][src] = (wt, v)
+
+        self.v_count = v_count
+        self.rank = rank
+        self.up, self.up_via = self.pack_rows(up_rows)
+        self.down, self.down_via = self.pack_rows(down_rows)
+
+    def shortcuts(self, v: int, in_edges: [], out_edges: []) -> []:
+        """
+        Helper method for build that returns the shortcuts (src, dst, weight) needed to
+        contract v: one for each path src -> v -> dst unless a witness search from src that
+        avoids v finds a path to dst that is no longer
+        """
+        shortcuts = []
+        if len(out_edges[v]) == 0:
+            return shortcuts
+        max_out = max(wt for wt, _ in out_edges[v].values())
+        for src, (wt_in, _) in in_edges[v].items():
+            witness = self.witness_search(src, v, wt_in + max_out, out_edges, out_edges[v])
+            for dst, (wt_out, _) in out_edges[v].items():
+                if dst != src and witness.get(dst, float("inf")) > wt_in + wt_out:
+                    shortcuts.append((src, dst, wt_in + wt_out))
+        return shortcuts
+
+    def witness_search(self, src: int, skip: int, limit: int, out_edges: [],
+                       targets) -> dict:
+        """
+        Helper method for shortcuts that runs Dijkstra from SRC among the vertices not yet
+        contracted, never entering SKIP and never going past LIMIT, and returns the distances
+        found. It ends once every vertex in TARGETS is settled, or after WITNESS_LIMIT
+        vertices, which can only add unneeded shortcuts.
+        """
+        distances = {src: 0}
+        hq = [(0, src)]
+        settled = 0
+        remaining = len(targets)
+        while len(hq) > 0 and settled < self.WITNESS_LIMIT and remaining > 0:
+            dist, v = heapq.heappop(hq)
+            if dist > distances[v]:
+                continue
+            settled += 1
+            if v in targets:
+                remaining -= 1
+            for val, (wt, _) in out_edges[v].items():
+                dist_2 = dist + wt
+                if val != skip and dist_2 <= limit and dist_2 < distances.get(val, float("inf")):
+                    distances[val] = dist_2
+                    heapq.heappush(hq, (dist_2, val))
+        return distances
+
+    @staticmethod
+    def pack_rows(rows: []) -> tuple:
+        """
+        Helper method for build that stores lists of (neighbor, weight, via) tuples, one per
+        vertex, as a CSRMatrix and an array of vias. A shortcut adds up the weights it
+        replaces, so if one of them is larger than MAX_WEIGHT the weights are kept in a list.
+        """
+        matrix = CSRMatrix(len(rows))
+        via = array('q')
+        weights = []
+        for v, row in enumerate(rows):
+            for dst, wt, middle in row:
+                matrix.targets.append(dst)
+                weights.append(wt)
+                via.append(middle)
+            matrix.offsets[v + 1] = len(matrix.targets)
+        matrix.targets = compact_array(matrix.targets)
+        try:
+            matrix.weights = compact_array(array('q', weights))
+        except OverflowError:
+            matrix.weights = weights
+        return matrix, compact_array(via)
+
+    def distance(self, src: int, dst: int):
+        """
+        Returns the length of a shortest path from SRC to DST, the same value as
+        dijkstra(src)[dst] on the graph (infinity if unreachable or not in the graph)
+        """
+        return self.search(src, dst)[0]
+
+    def shortest_path(self, src: int, dst: int) -> tuple:
+        """
+        Returns a shortest path from SRC to DST and its length as a tuple (path, cost), like
+        DirectedGraph.shortest_path, with every shortcut expanded into the edges it replaces.
+        If dst is not reachable from src (or either vertex is not in the graph), returns
+        ([], infinity).
+        """
+        best, meet, forward, backward = self.search(src, dst)
+        if best == float("inf"):
+            return [], best
+
+        # edges from src up to the meeting vertex, then from there down to dst
+        edges = []
+        v = meet
+        while forward[v] is not None:
+            prev, pos = forward[v]
+            edges.append((prev, v, self.up_via[pos]))
+            v = prev
+        edges.reverse()
+        v = meet
+        while backward[v] is not None:
+            nxt, pos = backward[v]
+            edges.append((v, nxt, self.down_via[pos]))
+            v = nxt
+
+        path = [src]
+        for edge in edges:
+            path.extend(self.unpack(*edge))
+        return path, best
+
+    def unpack(self, src: int, dst: int, via: int) -> []:
+        """
+        Helper method for shortest_path that returns the vertices after SRC on the edges that
+        the edge src -> dst stands for. A shortcut around via is made of the edge src -> via,
+        stored in row via of down, and the edge via -> dst, stored in row via of up.
+        """
+        vertices = []
+        stack = [(src, dst, via)]
+        while len(stack) > 0:
+            src, dst, via = stack.pop()
+            if via < 0:
+                vertices.append(dst)
+                continue
+            # pushes the second half first so that the first half is expanded first
+            stack.append((via, dst, self.up_via[self.up.find(via, dst)]))
+            stack.append((src, via, self.down_via[self.down.find(via, src)]))
+        return vertices
+
+    def search(self, src: int, dst: int) -> tuple:
+        """
+        Helper method for distance and shortest_path that runs the bidirectional upward
+        search. Returns (best, meet, forward, backward): the distance, the vertex where the
+        searches met, and the (vertex, edge position) each vertex was reached from in the
+        forward search over up and the backward search over down.
+        """
+        inf = float("inf")
+        if not 0 <= src < self.v_count or not 0 <= dst < self.v_count:
+            return inf, -1, {}, {}
+
+        best, meet = inf, -1
+        sides = [({src: 0}, {src: None}, [(0, src)], self.up),
+                 ({dst: 0}, {dst: None}, [(0, dst)], self.down)]
+        while len(sides[0][2]) > 0 or len(sides[1][2]) > 0:
+            # expands whichever search has the closer vertex next
+            forward_queue, backward_queue = sides[0][2], sides[1][2]
+            turn = 0 if len(backward_queue) == 0 or (
+                len(forward_queue) > 0 and forward_queue[0][0] <= backward_queue[0][0]) else 1
+            distances, previous, hq, matrix = sides[turn]
+            other = sides[1 - turn][0]
+
+            dist, v = heapq.heappop(hq)
+            # no vertex this search still holds can lead to a shorter path
+            if dist >= best:
+                hq.clear()
+                continue
+            if dist > distances[v]:
+                continue
+            if v in other and dist + other[v] < best:
+                best, meet = dist + other[v], v
+            offsets, targets, weights = matrix.offsets, matrix.targets, matrix.weights
+            for pos in range(offsets[v], offsets[v + 1]):
+                val = targets[pos]
+                dist_2 = dist + weights[pos]
+                if dist_2 < distances.get(val, inf):
+                    distances[val] = dist_2
+                    previous[val] = (v, pos)
+                    heapq.heappush(hq, (dist_2, val))
+        return best, meet, sides[0][1], sides[1][1]
+
+
+class DistanceMatrix:
+    """
+    Compact table of shortest path lengths, stored row by row in one array of doubles (or
+    floats, for typecode 'f'). Entry (i, v) is the distance from the i-th source to vertex v,
+    infinity if unreachable. If a path is given, the table lives in a memory-mapped file, and
+    if shared is True, in a block of shared memory that other processes can attach to by the
+    name of block.
+    """
+
+    # SharedMemory holding the table, if it was created with shared=True
+    block = None
+
+    def __init__(self, rows: int, cols: int, typecode='d', path=None, shared=False):
+        """
+        Creates a rows x cols table with every entry set to infinity
+        """
+        self.rows = rows
+        self.cols = cols
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        if shared:
+            size = rows * cols * self.itemsize
+            self.block = SharedMemory(create=True, size=max(size, 1))
+            self.data = self.block.buf[:size].cast(typecode)
+            row = array(typecode, [float("inf")]) * cols
+            for i in range(rows):
+                self.data[i * cols:(i + 1) * cols] = row
+            return
+        if path is None:
+            self.data = array(typecode, [float("inf")]) * (rows * cols)
+            return
+
+        # writes the file one row at a time, then maps it
+        row = array(typecode, [float("inf")]) * cols
+        with open(path, 'w+b') as file:
+            for _ in range(rows):
+                file.write(row)
+            file.flush()
+            if rows * cols == 0:
+                self.data = array(typecode)
+            else:
+                self.data = memoryview(mmap.mmap(file.fileno(), 0)).cast(typecode)
+
+    def __del__(self):
+        # a shared memory block cannot be closed while the view of the table still uses it
+        if self.block is not None:
+            self.data = None
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, key):
+        # table[i, v] is one distance, table[i] is the row of source i
+        if isinstance(key, tuple):
+            i, v = key
+            return self.data[i * self.cols + v]
+        return self.row(key)
+
+    def row(self, i: int) -> array:
+        """
+        Returns a copy of row i
+        """
+        row = self.data[i * self.cols:(i + 1) * self.cols]
+        # rows of a memory-mapped table are copied out of the mapping
+        if isinstance(row, memoryview):
+            return array(self.typecode, row.tobytes())
+        return row
+
+    def view(self, i: int) -> memoryview:
+        """
+        Returns a writable view of row i that shares memory with the table
+        """
+        return memoryview(self.data)[i * self.cols:(i + 1) * self.cols]
+
+    def tolist(self) -> []:
+        """
+        Returns the table as a list of lists
+        """
+        return [self.row(i).tolist() for i in range(self.rows)]
+
+    def flush(self) -> None:
+        """
+        Writes a memory-mapped table back to its file (does nothing otherwise)
+        """
+        if isinstance(self.data, memoryview):
+            self.data.obj.flush()
+
+
+class DenseRow:
+    """
+    View of one row of a DenseMatrix that supports the same indexing as a row of a list of
+    lists (reading, assigning and iterating over weights).
+    """
+
+    def __init__(self, matrix, src: int):
+        self.matrix = matrix
+        self.src = src
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def index(self, dst: int) -> int:
+        """
+        Helper method that checks dst like a list index and returns it as a non-negative index
+        """
+        size = len(self.matrix)
+        if dst < 0:
+            dst += size
+        if not 0 <= dst < size:
+            raise IndexError('vertex index out of range')
+        return dst
+
+    def __getitem__(self, dst: int) -> int:
+        return self.matrix.get(self.src, self.index(dst))
+
+    def __setitem__(self, dst: int, weight: int) -> None:
+        write_edge(self.matrix, self.src, self.index(dst), weight)
+
+    def __iter__(self):
+        return iter(self.matrix.row(self.src))
+
+
+class DenseMatrix:
+    """
+    Dense adjacency matrix for DirectedGraph, with all rows laid out in one contiguous array.
+    Row u starts at u * stride. Only the rows of existing vertices are stored, and when a new
+    vertex no longer fits in a row the stride grows by a quarter, so adding a vertex costs
+    O(V) amortized (the size of its row) instead of padding every row, and the matrix holds
+    at most about 1.25 * V² entries. Matrices built in bulk have no spare columns.
+    """
+
+    def __init__(self, size=0):
+        """
+        Creates a matrix of size vertices with no edges
+        """
+        self.size = size
+        self.stride = size
+        self.data = array('q', [0]) * (size * size)
+        # graph that stores its edges here, set by its adj_matrix setter
+        self.graph = None
+
+    @classmethod
+    def from_rows(cls, rows: []) -> 'DenseMatrix':
+        """
+        Builds a matrix from a square list of lists. Entries that do not fit in 64 bits
+        cannot be valid weights and are stored as 0 (no edge).
+        """
+        matrix = cls(len(rows))
+        for src, row in enumerate(rows):
+            start = src * matrix.stride
+            try:
+                matrix.data[start:start + len(row)] = array('q', row)
+            except OverflowError:
+                row = [wt if -MAX_WEIGHT <= wt <= MAX_WEIGHT else 0 for wt in row]
+                matrix.data[start:start + len(row)] = array('q', row)
+        return matrix
+
+    @classmethod
+    def from_arrays(cls, v_count: int, srcs: array, dsts: array, wts: array) -> 'DenseMatrix':
+        """
+        Builds the matrix in one pass from parallel arrays of valid edges. For duplicate
+        edges the last weight is kept.
+        """
+        matrix = cls(v_count)
+        data, stride = matrix.data, matrix.stride
+        for u, v, weight in zip(srcs, dsts, wts):
+            data[u * stride + v] = weight
+        return matrix
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, src: int) -> DenseRow:
+        if src < 0:
+            src += self.size
+        if not 0 <= src < self.size:
+            raise IndexError('vertex index out of range')
+        return DenseRow(self, src)
+
+    def __iter__(self):
+        for src in range(self.size):
+            yield DenseRow(self, src)
+
+    def add_vertices(self, count: int) -> None:
+        """
+        Adds count vertices with no edges, widening the rows if they do not fit
+        """
+        size = self.size + count
+        if size > self.stride:
+            stride = max(size, self.stride + self.stride // 4)
+            data = array('q', [0]) * (self.size * stride)
+            # copies each row into its place in the wider layout
+            for src in range(self.size):
+                old = src * self.stride
+                data[src * stride:src * stride + self.size] = self.data[old:old + self.size]
+            self.data = data
+            self.stride = stride
+        # columns past the old size are still 0, as edges are only ever zeroed out
+        self.data.extend(array('q', [0]) * (count * self.stride))
+        self.size = size
+
+    def row(self, src: int) -> array:
+        """
+        Returns a copy of the weights in row src
+        """
+        start = src * self.stride
+        return self.data[start:start + self.size]
+
+    def neighbors(self, src: int) -> []:
+        """
+        Returns the out-edges of src as (dst, weight) tuples sorted by destination
+        """
+        return [(dst, wt) for dst, wt in enumerate(self.row(src)) if wt != 0]
+
+    def predecessors(self, dst: int) -> []:
+        """
+        Returns the in-edges of dst as (src, weight) tuples sorted by source
+        """
+        column = self.data[dst:self.size * self.stride:self.stride]
+        return [(src, wt) for src, wt in enumerate(column) if wt != 0]
+
+    def get(self, src: int, dst: int) -> int:
+        """
+        Returns the weight of edge (src, dst), or 0 if there is no edge
+        """
+        return self.data[src * self.stride + dst]
+
+    def max_weight(self) -> int:
+        """
+        Returns the largest edge weight, or 0 if there are no edges
+        """
+        return max(self.data, default=0)
+
+    def set(self, src: int, dst: int, weight: int) -> None:
+        """
+        Sets the weight of edge (src, dst); a weight of 0 removes the edge
+        """
+        self.data[src * self.stride + dst] = weight
+
+
+class CSRRow:
+    """
+    View of one row of a CSRMatrix that supports the same indexing as a row of the
+    dense adjacency matrix (reading, assigning and iterating over weights).
+    """
+
+    def __init__(self, matrix, src: int):
+        self.matrix = matrix
+        self.src = src
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __getitem__(self, dst: int) -> int:
+        return self.matrix.get(self.src, dst)
+
+    def __setitem__(self, dst: int, weight: int) -> None:
+        write_edge(self.matrix, self.src, dst, weight)
+
+    def __iter__(self):
+        # yields the dense row, with 0 wherever there is no edge
+        row = [0] * len(self.matrix)
+        for dst, wt in self.matrix.neighbors(self.src):
+            row[dst] = wt
+        return iter(row)
+
+
+class CSRMatrix:
+    """
+    Compressed sparse row storage for the edges of a directed graph. The out-edges of
+    vertex u are targets[offsets[u]:offsets[u + 1]], sorted by destination, with the
+    matching weights in the same positions of weights. Memory is O(V + E) and the
+    out-edges of a vertex are found in O(out-degree).
+    """
+
+    def __init__(self, v_count=0):
+        """
+        Creates storage for v_count vertices and no edges
+        """
+        self.offsets = array('q', [0]) * (v_count + 1)
+        self.targets = array('q')
+        self.weights = array('q')
+        # CSRMatrix of the reversed edges, built on first use and dropped on any change
+        self.transpose = None
+        # graph that stores its edges here, set by its adj_matrix setter
+        self.graph = None
+
+    @classmethod
+    def from_arrays(cls, v_count: int, srcs: array, dsts: array, wts: array) -> 'CSRMatrix':
+        """
+        Builds the matrix from parallel arrays of valid edges with a counting sort: edges are
+        counted per source, placed in their rows, and then each row is sorted on its own, so
+        no per-edge keys are built. For duplicate edges the last weight is kept.
+        """
+        matrix = cls(v_count)
+        offsets = matrix.offsets
+        for u in srcs:
+            offsets[u + 1] += 1
+        # turns per-vertex counts into offsets
+        for u in range(v_count):
+            offsets[u + 1] += offsets[u]
+
+        # places the edges of each source in its row, in input order
+        targets = array('q', [0]) * len(srcs)
+        weights = array('q', [0]) * len(srcs)
+        free = offsets[:-1]
+        for u, v, weight in zip(srcs, dsts, wts):
+            pos = free[u]
+            targets[pos] = v
+            weights[pos] = weight
+            free[u] = pos + 1
+        del free
+
+        # sorts each row by destination, moving it down over the duplicates removed so far
+        end = 0
+        for u in range(v_count):
+            lo, hi = offsets[u], offsets[u + 1]
+            offsets[u] = end
+            row_targets, row_weights = targets[lo:hi], weights[lo:hi]
+            # a stable sort leaves the last duplicate at the end of its run
+            order = sorted(range(hi - lo), key=row_targets.__getitem__)
+            for k, i in enumerate(order):
+                if k + 1 < len(order) and row_targets[order[k + 1]] == row_targets[i]:
+                    continue
+                targets[end] = row_targets[i]
+                weights[end] = row_weights[i]
+                end += 1
+        offsets[v_count] = end
+        del targets[end:]
+        del weights[end:]
+        matrix.targets, matrix.weights = targets, weights
+        return matrix
+
+    @classmethod
+    def snapshot(cls, graph) -> 'CSRMatrix':
+        """
+        Builds a compact copy of the edges of GRAPH for read-only use. Targets and weights are
+        stored as 32-bit integers when they fit, and the transposed matrix is built up front
+        so that nothing is computed lazily later.
+        """
+        matrix = cls(graph.v_count)
+        for src in range(graph.v_count):
+            for dst, wt in graph.neighbors(src):
+                matrix.targets.append(dst)
+                matrix.weights.append(wt)
+            matrix.offsets[src + 1] = len(matrix.targets)
+        # builds the transposed matrix now rather than on first use
+        if graph.v_count > 0:
+            matrix.predecessors(0)
+        for part in (matrix, matrix.transpose):
+            if part is not None:
+                part.targets = compact_array(part.targets)
+                part.weights = compact_array(part.weights)
+        return matrix
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, src: int) -> CSRRow:
+        if not 0 <= src < len(self):
+            raise IndexError('vertex index out of range')
+        return CSRRow(self, src)
+
+    def __iter__(self):
+        for src in range(len(self)):
+            yield CSRRow(self, src)
+
+    def add_vertices(self, count: int) -> None:
+        """
+        Adds count vertices with no edges
+        """
+        self.offsets.extend(array('q', [self.offsets[-1]]) * count)
+        self.transpose = None
+
+    def neighbors(self, src: int) -> []:
+        """
+        Returns the out-edges of src as (dst, weight) tuples sorted by destination
+        """
+        lo, hi = self.offsets[src], self.offsets[src + 1]
+        return list(zip(self.targets[lo:hi], self.weights[lo:hi]))
+
+    def predecessors(self, dst: int) -> []:
+        """
+        Returns the in-edges of dst as (src, weight) tuples sorted by source. The first call
+        after a change builds the transposed matrix in O(E log E).
+        """
+        if self.transpose is None:
+            srcs = array('q')
+            for src in range(len(self)):
+                srcs.extend(array('q', [src]) * (self.offsets[src + 1] - self.offsets[src]))
+            self.transpose = CSRMatrix.from_arrays(len(self), self.targets, srcs, self.weights)
+        return self.transpose.neighbors(dst)
+
+    def find(self, src: int, dst: int) -> int:
+        """
+        Returns the position of edge (src, dst) in targets, or -1 if there is no edge
+        """
+        lo, hi = self.offsets[src], self.offsets[src + 1]
+        pos = bisect_left(self.targets, dst, lo, hi)
+        if pos < hi and self.targets[pos] == dst:
+            return pos
+        return -1
+
+    def get(self, src: int, dst: int) -> int:
+        """
+        Returns the weight of edge (src, dst), or 0 if there is no edge
+        """
+        pos = self.find(src, dst)
+        return self.weights[pos] if pos >= 0 else 0
+
+    def max_weight(self) -> int:
+        """
+        Returns the largest edge weight, or 0 if there are no edges
+        """
+        return max(self.weights, default=0)
+
+    def set(self, src: int, dst: int, weight: int) -> None:
+        """
+        Sets the weight of edge (src, dst); a weight of 0 removes the edge. Inserting or
+        removing an edge shifts the arrays, so it costs O(V + E).
+        """
+        self.transpose = None
+        pos = self.find(src, dst)
+        if pos >= 0:
+            if weight != 0:
+                self.weights[pos] = weight
+                return
+            del self.targets[pos]
+            del self.weights[pos]
+            shift = -1
+        elif weight != 0:
+            pos = bisect_left(self.targets, dst, self.offsets[src], self.offsets[src + 1])
+            self.targets.insert(pos, dst)
+            self.weights.insert(pos, weight)
+            shift = 1
+        else:
+            return
+
+        # moves the start of every later row by the inserted or removed edge
+        tail = self.offsets[src + 1:]
+        self.offsets[src + 1:] = array('q', map(shift.__add__, tail))
+
+
+class SparseDirectedGraph(DirectedGraph):
+    """
+    Directed weighted graph with the same rules and methods as DirectedGraph, storing its
+    edges in a CSRMatrix instead of a dense adjacency matrix. Intended for large sparse
+    graphs that are built once from start_edges and then mostly queried.
+    """
+
+    def __init__(self, start_edges=None):
+        """
+        Store graph info as compressed sparse rows, built in one pass from start_edges
+        """
+        self.v_count = 0
+        self.adj_matrix = CSRMatrix()
+
+        if start_edges is not None:
+            self.load_edges(start_edges)
+
+
+class FrozenDirectedGraph(DirectedGraph):
+    """
+    Read-only snapshot of a DirectedGraph for query serving, made with freeze(). Edges are
+    kept in compact CSR arrays (with the reversed edges precomputed), so memory is O(V + E)
+    and the arrays can be shared by worker processes. All queries work as on DirectedGraph;
+    methods that would change the graph raise TypeError.
+    """
+
+    def __init__(self, graph=None):
+        """
+        Store a snapshot of GRAPH (any DirectedGraph) as compact compressed sparse rows
+        """
+        if graph is None:
+            self.adj_matrix = CSRMatrix()
+            self.v_count = 0
+        else:
+            self.adj_matrix = CSRMatrix.snapshot(graph)
+            self.v_count = graph.v_count
+
+    @classmethod
+    def from_matrix(cls, matrix: 'CSRMatrix', v_count: int) -> 'FrozenDirectedGraph':
+        """
+        A method that wraps MATRIX, which must not change afterwards (such as one whose arrays
+        are mapped from a file by load_graph), as a snapshot with v_count vertices.
+        """
+        graph = cls.__new__(cls)
+        graph.adj_matrix = matrix
+        graph.v_count = v_count
+        return graph
+
+    @property
+    def adj_matrix(self):
+        """
+        Edge storage of the snapshot, a CSRMatrix that cannot be replaced
+        """
+        return self.storage
+
+    @adj_matrix.setter
+    def adj_matrix(self, value):
+        # the storage is set once, when the snapshot is built
+        if 'storage' in self.__dict__:
+            raise TypeError('FrozenDirectedGraph is read-only')
+        DirectedGraph.adj_matrix.fset(self, value)
+
+    def read_only(self, *args, **kwargs):
+        """
+        Replaces every method that would change the graph
+        """
+        raise TypeError('FrozenDirectedGraph is read-only')
+
+    add_vertex = add_vertices = add_edge = remove_edge = load_edge_arrays = load_edges = \
+        track_topological_order = read_only
+
+    def freeze(self) -> 'FrozenDirectedGraph':
+        """
+        A method that returns the snapshot itself, as it cannot change.
+        """
+        return self
+
+
 if __name__ == '__main__':
 
     print("\nPDF - method add_vertex() / add_edge example 1")
@@ -498,3 +2155,105 @@ if __name__ == '__main__':
     print('\n', g)
     for i in range(5):
         print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+
+    print("\nSparseDirectedGraph - get_edges() / dijkstra() example 1")
+    print("---------------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = SparseDirectedGraph(edges)
+    print(g.get_edges())
+    for i in range(5):
+        print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+
+    print("\nmethod shortest_path() example 1")
+    print("--------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src, dst in [(0, 2), (2, 0), (3, 4), (1, 1)]:
+        print(src, dst, g.shortest_path(src, dst), g.shortest_path(src, dst, bidirectional=True))
+
+    print("\nmethod all_pairs_shortest_paths() example 1")
+    print("-------------------------------------------")
+    table = g.all_pairs_shortest_paths(workers=2)
+    for i in range(g.v_count):
+        print(f'{i}: {table.row(i).tolist()}')
+    print(table.tolist() == g.all_pairs_shortest_paths(method='floyd').tolist())
+
+    print("\nmethod bfs_levels() / bfs_distances() example 1")
+    print("-----------------------------------------------")
+    for src in range(g.v_count):
+        print(src, g.bfs_levels(src), g.bfs_distances(src))
+
+    print("\nContractionHierarchy - distance() / shortest_path() example 1")
+    print("-------------------------------------------------------------")
+    ch = ContractionHierarchy(g)
+    print([ch.rank[v] for v in range(g.v_count)])
+    for src, dst in [(0, 2), (2, 0), (3, 4), (1, 1)]:
+        print(src, dst, ch.shortest_path(src, dst), ch.distance(src, dst) == g.dijkstra(src)[dst])
+
+
+    print("\nmethod iter_dfs() / iter_bfs() example 1")
+    print("----------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src in range(g.v_count):
+        print(src, list(g.iter_dfs(src, stop=lambda v: v == 3)), list(g.iter_bfs(src)))
+    print(list(g.iter_bfs(0, tree=True)))
+
+
+    print("\nmethod track_topological_order() example 1")
+    print("------------------------------------------")
+    g = DirectedGraph([(0, 1, 1), (1, 2, 1), (0, 3, 1), (3, 2, 1)])
+    print(g.track_topological_order(), g.topological_order())
+    g.add_vertex()
+    g.add_edge(4, 0, 1)
+    print(g.topological_order())
+    # an edge that would close a cycle is rejected
+    g.add_edge(2, 4, 1)
+    print(g.get_edges(), g.has_cycle())
+    try:
+        g.load_edges([(0, 1, 1), (1, 0, 1)])
+    except ValueError as error:
+        print(error, g.get_edges() == [(0, 1, 1), (0, 3, 1), (1, 2, 1), (3, 2, 1), (4, 0, 1)])
+
+
+    print("\nmethod freeze() example 1")
+    print("-------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    frozen = g.freeze()
+    print(frozen.get_edges() == g.get_edges(), frozen.dijkstra(0) == g.dijkstra(0))
+    g.add_edge(0, 2, 1)
+    print(frozen.dijkstra(0), g.dijkstra(0))
+    try:
+        frozen.add_edge(0, 2, 1)
+    except TypeError as error:
+        print(error)
+
+
+    print("\nmethod enable_locking() example 1")
+    print("---------------------------------")
+    import threading
+
+    g = DirectedGraph(edges)
+    lock = g.enable_locking()
+    # a change from another thread runs between the items of a suspended iterator
+    edge_iter = g.iter_edges()
+    print(next(edge_iter))
+    writer = threading.Thread(target=g.add_edge, args=(2, 0, 4))
+    writer.start()
+    writer.join()
+    print(list(edge_iter))
+    # holding the lock for writing makes several changes one atomic update
+    lock.acquire_write()
+    try:
+        g.remove_edge(2, 0)
+        g.add_edge(0, 2, 1)
+    finally:
+        lock.release_write()
+    print(g.get_edges())
@@ -0,0 +1,29 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description: Memoization of read-only graph queries, shared by both graph classes.
+
+import functools
+
+
+def memoized(method):
+    """
+    Decorator for graph queries that take no arguments. The result is stored together with
+    the graph's version and reused until a mutator bumps the version, so repeated queries on
+    a graph that has not changed cost O(1). Lists and dictionaries are copied on return so
+    that callers cannot change the cached value.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self):
+        cache = self.__dict__.setdefault('query_cache', dict())
+        entry = cache.get(name)
+        if entry is None or entry[0] != self.version:
+            entry = (self.version, method(self))
+            cache[name] = entry
+        result = entry[1]
+        if isinstance(result, (list, dict)):
+            return result.copy()
+        return result
+
+    return wrapper
@@ -0,0 +1,372 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description: Binary files with memory-mapped loading, and edge-list readers, for the graphs.
+
+import csv
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from d_graph import CSRMatrix, ContractionHierarchy, DirectedGraph, FrozenDirectedGraph
+from ud_graph import FrozenUndirectedGraph
+
+# file layout: header, one entry per section, then the sections themselves, each starting
+# on an 8-byte boundary so that it can be cast in place to an array of its typecode
+MAGIC = b'CSRG'
+FORMAT_VERSION = 1
+DIRECTED, UNDIRECTED, HIERARCHY = 0, 1, 2
+HEADER = struct.Struct('=4sBBcxqq')
+SECTION = struct.Struct('=c7xq')
+ALIGN = 8
+# bytes of text read at a time by the edge-list readers
+CHUNK_SIZE = 1 << 20
+
+
+class NameTable:
+    """
+    Read-only sequence of the vertex names of a loaded UndirectedGraph. Names are decoded
+    from the mapped file only when they are read, so opening a graph does not cost O(V).
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError('vertex id out of range')
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class NameIndex:
+    """
+    Maps the names of a NameTable back to vertex ids by binary search, as names are stored in
+    sorted order
+    """
+
+    def __init__(self, names: NameTable):
+        self.names = names
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, name) -> int:
+        """
+        Returns the id of name, or -1 if there is no such vertex
+        """
+        if not isinstance(name, str):
+            return -1
+        pos = bisect_left(self.names, name)
+        if pos < len(self.names) and self.names[pos] == name:
+            return pos
+        return -1
+
+    def __contains__(self, name) -> bool:
+        return self.find(name) >= 0
+
+    def __getitem__(self, name) -> int:
+        pos = self.find(name)
+        if pos < 0:
+            raise KeyError(name)
+        return pos
+
+
+def name_sections(names) -> tuple:
+    """
+    Encodes vertex names as an array of offsets into one UTF-8 blob
+    """
+    offsets, blob = array('q', [0]), bytearray()
+    for name in names:
+        blob += str(name).encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, array('B', blob)
+
+
+def save_graph(graph, path) -> None:
+    """
+    Writes graph (a DirectedGraph or UndirectedGraph of any kind) to the file at path. The
+    graph is frozen first, so the file holds its compact CSR arrays: offsets, targets and
+    weights (and the same for the reversed edges) of a directed graph, or offsets, targets
+    and the sorted vertex-name table of an undirected graph.
+    """
+    frozen = graph.freeze()
+    if isinstance(frozen, FrozenDirectedGraph):
+        matrix = frozen.adj_matrix
+        # an empty graph has no transposed matrix
+        transpose = matrix.transpose if matrix.transpose is not None else CSRMatrix()
+        kind = DIRECTED
+        sections = [matrix.offsets, matrix.targets, matrix.weights,
+                    transpose.offsets, transpose.targets, transpose.weights]
+        v_count = frozen.v_count
+    else:
+        kind = UNDIRECTED
+        sections = [frozen.offsets, frozen.targets, *name_sections(frozen.names)]
+        v_count = len(frozen.names)
+
+    write_sections(path, kind, v_count, sections)
+
+
+def write_sections(path, kind: int, v_count: int, sections: []) -> None:
+    """
+    Writes the header, the section table and the arrays in SECTIONS to the file at path
+    """
+    order = b'<' if sys.byteorder == 'little' else b'>'
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, order, v_count, len(sections)))
+        for section in sections:
+            file.write(SECTION.pack(memoryview(section).format.encode('ascii'), len(section)))
+        for section in sections:
+            file.write(bytes(-file.tell() % ALIGN))
+            file.write(section)
+
+
+def load_graph(path):
+    """
+    Opens a graph written by save_graph and returns it as a FrozenDirectedGraph or
+    FrozenUndirectedGraph. The file is memory-mapped and the arrays of the graph are views
+    into the mapping, so opening takes O(1) time however large the graph is, pages are read
+    from disk only when queries touch them, and processes that load the same file share one
+    copy in the page cache.
+    """
+    kind, v_count, sections = read_sections(path)
+    if kind == DIRECTED:
+        matrix, transpose = CSRMatrix(), CSRMatrix()
+        matrix.offsets, matrix.targets, matrix.weights = sections[:3]
+        transpose.offsets, transpose.targets, transpose.weights = sections[3:]
+        if v_count > 0:
+            matrix.transpose = transpose
+        graph = FrozenDirectedGraph.from_matrix(matrix, v_count)
+    elif kind == UNDIRECTED:
+        graph = FrozenUndirectedGraph()
+        graph.offsets, graph.targets = sections[:2]
+        graph.names = NameTable(*sections[2:])
+        graph.ids = NameIndex(graph.names)
+    else:
+        raise ValueError(f'{path} holds a contraction hierarchy, not a graph')
+    return graph
+
+
+def save_hierarchy(hierarchy: ContractionHierarchy, path) -> None:
+    """
+    Writes a ContractionHierarchy to the file at path: the rank of each vertex and the
+    upward and downward edges with the vertex each shortcut bypasses. Raises ValueError if
+    a shortcut weight is larger than MAX_WEIGHT, as the file stores 64-bit integers.
+    """
+    if not all(isinstance(wts, array) for wts in (hierarchy.up.weights, hierarchy.down.weights)):
+        raise ValueError('shortcut weights do not fit in 64 bits')
+    sections = [hierarchy.rank,
+                hierarchy.up.offsets, hierarchy.up.targets, hierarchy.up.weights,
+                hierarchy.up_via,
+                hierarchy.down.offsets, hierarchy.down.targets, hierarchy.down.weights,
+                hierarchy.down_via]
+    write_sections(path, HIERARCHY, hierarchy.v_count, sections)
+
+
+def load_hierarchy(path) -> ContractionHierarchy:
+    """
+    Opens a hierarchy written by save_hierarchy, memory-mapped in the same way as load_graph,
+    so a server can answer queries as soon as the file is opened
+    """
+    kind, v_count, sections = read_sections(path)
+    if kind != HIERARCHY:
+        raise ValueError(f'{path} does not hold a contraction hierarchy')
+    hierarchy = ContractionHierarchy()
+    hierarchy.v_count = v_count
+    hierarchy.rank = sections[0]
+    hierarchy.up.offsets, hierarchy.up.targets, hierarchy.up.weights = sections[1:4]
+    hierarchy.up_via = sections[4]
+    hierarchy.down.offsets, hierarchy.down.targets, hierarchy.down.weights = sections[5:8]
+    hierarchy.down_via = sections[8]
+    return hierarchy
+
+
+def read_sections(path) -> tuple:
+    """
+    Maps the file at path and returns (kind, v_count, sections), each section being a view
+    of one array cast in place
+    """
+    with open(path, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(data)
+    if len(buffer) < HEADER.size or buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a saved graph')
+    _, version, kind, order, v_count, count = HEADER.unpack_from(buffer)
+    if version != FORMAT_VERSION:
+        raise ValueError(f'{path} has unsupported format version {version}')
+    if order != (b'<' if sys.byteorder == 'little' else b'>'):
+        raise ValueError(f'{path} was saved on a machine with a different byte order')
+
+    # casts each section in place; the views keep the mapping open
+    sections = []
+    pos = HEADER.size + count * SECTION.size
+    for i in range(count):
+        typecode, length = SECTION.unpack_from(buffer, HEADER.size + i * SECTION.size)
+        typecode = typecode.decode('ascii')
+        pos += -pos % ALIGN
+        end = pos + length * array(typecode).itemsize
+        sections.append(buffer[pos:end].cast(typecode))
+        pos = end
+    return kind, v_count, sections
+
+
+def read_chunks(path, chunk_size: int, progress=None):
+    """
+    Yields the lines of the file at path in lists of about chunk_size bytes. After each chunk
+    has been used, calls progress(bytes_read, file_size) if progress is given.
+    """
+    total = os.path.getsize(path)
+    done = 0
+    with open(path, 'rb') as file:
+        while True:
+            lines = file.readlines(chunk_size)
+            if len(lines) == 0:
+                return
+            yield lines
+            done += sum(map(len, lines))
+            if progress is not None:
+                progress(done, total)
+
+
+def edge_tuples(rows, graph_class):
+    """
+    Turns rows of text fields into the edge tuples that graph_class.from_iterable takes:
+    (src, dst, weight) with integer indices for directed graphs, weight 1 if the row has no
+    third field, and (u, v) names for undirected graphs. Rows with fewer than 2 fields are
+    skipped.
+    """
+    directed = issubclass(graph_class, DirectedGraph)
+    for row in rows:
+        if len(row) < 2:
+            continue
+        if directed:
+            yield int(row[0]), int(row[1]), int(row[2]) if len(row) > 2 else 1
+        else:
+            yield row[0].strip(), row[1].strip()
+
+
+def load_edgelist(path, graph_class=DirectedGraph, delimiter=None, comment='#',
+                  chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Builds a graph of graph_class (DirectedGraph, SparseDirectedGraph or UndirectedGraph)
+    from a text file with one edge per line: "src dst [weight]" for directed graphs or
+    "u v" for undirected graphs. Fields are split on delimiter (any whitespace by default),
+    and blank lines and lines starting with comment are skipped. The file is read in chunks
+    of chunk_size bytes and the edges are streamed into the bulk build path of graph_class,
+    so the whole file is never held in memory. progress(bytes_read, file_size) is called
+    after each chunk if given.
+    """
+    comment = comment.encode('utf-8') if comment else None
+
+    def rows():
+        for lines in read_chunks(path, chunk_size, progress):
+            for line in lines:
+                line = line.strip()
+                if len(line) == 0 or (comment is not None and line.startswith(comment)):
+                    continue
+                yield line.decode('utf-8').split(delimiter)
+
+    return graph_class.from_iterable(edge_tuples(rows(), graph_class))
+
+
+def load_csv(path, graph_class=DirectedGraph, columns=(0, 1, 2), header=True, delimiter=',',
+             chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Builds a graph of graph_class from a CSV file in the same way as load_edgelist. columns
+    gives the positions of the source, destination and (optional) weight fields, and the
+    first row is skipped if header is True. Rows missing the source or destination column are
+    skipped, and rows with a missing or empty weight field get weight 1.
+    """
+    src, dst, *weight = columns
+
+    def rows():
+        skip = header
+        for lines in read_chunks(path, chunk_size, progress):
+            text = [line.decode('utf-8') for line in lines]
+            for row in csv.reader(text, delimiter=delimiter):
+                if skip:
+                    skip = False
+                    continue
+                if src >= len(row) or dst >= len(row):
+                    continue
+                # only the weight can be left out, so the fields never shift
+                fields = [row[src], row[dst]]
+                if len(weight) > 0 and weight[0] < len(row) and row[weight[0]].strip():
+                    fields.append(row[weight[0]])
+                yield fields
+
+    return graph_class.from_iterable(edge_tuples(rows(), graph_class))
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    from ud_graph import UndirectedGraph
+
+    folder = tempfile.TemporaryDirectory()
+
+
+    print("\nsave_graph() / load_graph() example 1")
+    print("-------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    path = os.path.join(folder.name, 'directed.csrg')
+    save_graph(g, path)
+    loaded = load_graph(path)
+    print(type(loaded).__name__, loaded.get_edges() == g.get_edges())
+    for i in range(5):
+        print(f'DIJKSTRA {i} {loaded.dijkstra(i)}')
+
+    u_edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    ug = UndirectedGraph(u_edges)
+    path = os.path.join(folder.name, 'undirected.csrg')
+    save_graph(ug, path)
+    loaded = load_graph(path)
+    print(type(loaded).__name__, loaded.get_vertices())
+    print(loaded.dfs('A'), loaded.bfs('A'), loaded.count_connected_components())
+
+
+    print("\nsave_hierarchy() / load_hierarchy() example 1")
+    print("---------------------------------------------")
+    path = os.path.join(folder.name, 'hierarchy.csrg')
+    save_hierarchy(ContractionHierarchy(g), path)
+    ch = load_hierarchy(path)
+    for src, dst in [(0, 2), (2, 0), (3, 4), (1, 1)]:
+        print(src, dst, ch.shortest_path(src, dst), ch.distance(src, dst) == g.dijkstra(src)[dst])
+
+
+    print("\nload_edgelist() / load_csv() example 1")
+    print("--------------------------------------")
+    path = os.path.join(folder.name, 'edges.txt')
+    with open(path, 'w') as file:
+        file.write('# src dst weight\n')
+        file.writelines(f'{src} {dst} {weight}\n' for src, dst, weight in edges)
+    print(load_edgelist(path).get_edges() == g.get_edges())
+
+    path = os.path.join(folder.name, 'edges.csv')
+    with open(path, 'w') as file:
+        file.write('weight,u,v\n')
+        file.writelines(f'1,{u},{v}\n' for u, v in u_edges)
+    print(str(load_csv(path, UndirectedGraph, columns=(1, 2))) == str(ug))
+
+    # the weight column comes first; a row without a destination is skipped, and an empty
+    # weight field defaults to 1
+    path = os.path.join(folder.name, 'weighted.csv')
+    with open(path, 'w') as file:
+        file.write('weight,src,dst\n')
+        file.writelines(f'{weight},{src},{dst}\n' for src, dst, weight in edges)
+        file.write('9,4\n,0,2\n')
+    print(load_csv(path, columns=(1, 2, 0)).get_edges())
+
+    folder.cleanup()
@@ -0,0 +1,155 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description: Readers-writer lock and the concurrency mode shared by both graph classes.
+
+import contextlib
+import functools
+import threading
+
+
+class ReadWriteLock:
+    """
+    Lock that any number of threads can hold for reading at the same time, or one thread for
+    writing. A waiting writer keeps new readers out, so a steady stream of queries cannot
+    starve updates. The lock is re-entrant: a thread that holds it can acquire it again for
+    reading, and the writer can acquire it again for writing. A reader cannot upgrade to a
+    write lock, as two readers doing so would wait for each other forever.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.write_depth = 0
+        self.waiting_writers = 0
+        # per-thread read depth, and whether this thread is counted in readers
+        self.local = threading.local()
+
+    def acquire_read(self) -> None:
+        """
+        Blocks until the lock can be held for reading
+        """
+        depth = getattr(self.local, 'depth', 0)
+        # nested reads (and reads by the writer) never wait
+        if depth > 0 or self.writer == threading.get_ident():
+            self.local.depth = depth + 1
+            return
+        with self.condition:
+            while self.writer is not None or self.waiting_writers > 0:
+                self.condition.wait()
+            self.readers += 1
+        self.local.depth = 1
+        self.local.counted = True
+
+    def release_read(self) -> None:
+        """
+        Releases one read acquisition
+        """
+        self.local.depth -= 1
+        if self.local.depth == 0 and getattr(self.local, 'counted', False):
+            self.local.counted = False
+            with self.condition:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """
+        Blocks until the lock can be held for writing
+        """
+        me = threading.get_ident()
+        if self.writer == me:
+            self.write_depth += 1
+            return
+        if getattr(self.local, 'depth', 0) > 0:
+            raise RuntimeError('cannot acquire a write lock while holding a read lock')
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer is not None or self.readers > 0:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = me
+            self.write_depth = 1
+
+    def release_write(self) -> None:
+        """
+        Releases one write acquisition
+        """
+        self.write_depth -= 1
+        if self.write_depth == 0:
+            with self.condition:
+                self.writer = None
+                self.condition.notify_all()
+
+
+@contextlib.contextmanager
+def reading(lock):
+    """
+    Context manager that holds LOCK for reading, or does nothing if LOCK is None, so code
+    that makes several calls on a graph sees one version of it whether or not the graph is in
+    concurrency mode
+    """
+    if lock is None:
+        yield
+        return
+    lock.acquire_read()
+    try:
+        yield
+    finally:
+        lock.release_read()
+
+
+def install_lock(graph, lock: ReadWriteLock, read_methods, write_methods, iter_methods) -> None:
+    """
+    Replaces the listed methods of GRAPH (on the instance only, so other graphs and the class
+    are unaffected) with wrappers that hold LOCK for reading or writing while they run.
+    The iterators returned by ITER_METHODS hold the read lock while producing each item.
+    """
+    for name in read_methods:
+        setattr(graph, name, locked(getattr(graph, name), lock.acquire_read, lock.release_read))
+    for name in write_methods:
+        setattr(graph, name, locked(getattr(graph, name), lock.acquire_write, lock.release_write))
+    for name in iter_methods:
+        setattr(graph, name, locked_iterator(getattr(graph, name), lock))
+
+
+def locked(method, acquire, release):
+    """
+    Returns METHOD wrapped to call ACQUIRE before it runs and RELEASE after it returns
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        acquire()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            release()
+
+    return wrapper
+
+
+def locked_iterator(method, lock: ReadWriteLock):
+    """
+    Returns METHOD wrapped so that the iterator it returns holds LOCK for reading while each
+    item is produced, but not between items. Writers can run in between, so the iterator must
+    not keep live views into the graph across items (the graph classes iterate over copies and
+    skip vertices removed in the meantime).
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        lock.acquire_read()
+        try:
+            iterator = method(*args, **kwargs)
+        finally:
+            lock.release_read()
+        while True:
+            lock.acquire_read()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                lock.release_read()
+            yield item
+
+    return wrapper
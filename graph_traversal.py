@@ -0,0 +1,151 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description: Traversal core shared by the directed and undirected graph classes.
+
+from collections import deque
+
+
+def dfs_order(v_start, neighbors, stop=None):
+    """
+    Generator that yields the vertices reached by a depth-first search from v_start, in the
+    order they are visited. NEIGHBORS is a function that returns the neighbors of a vertex in
+    the order they should be picked (e.g. sorted). STOP is an optional predicate; the search
+    ends after the first vertex for which it returns True has been yielded.
+    Each vertex is expanded once and visited is a set, so a full search is O(V + E).
+    """
+    visited = set()
+    stack = [v_start]
+
+    while len(stack) > 0:
+        vertex = stack.pop()
+        if vertex in visited:
+            continue
+        visited.add(vertex)
+        yield vertex
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # pushes unvisited neighbors in reverse so that they will be popped in the correct order
+        stack.extend([val for val in reversed(neighbors(vertex)) if val not in visited])
+
+
+def dfs_tree(v_start, neighbors, stop=None):
+    """
+    Same search as dfs_order, but yields (vertex, parent, depth) tuples, where parent is the
+    vertex the search came from (None for v_start) and depth is the number of tree edges
+    between v_start and the vertex.
+    """
+    visited = set()
+    stack = [(v_start, None, 0)]
+
+    while len(stack) > 0:
+        vertex, parent, depth = stack.pop()
+        if vertex in visited:
+            continue
+        visited.add(vertex)
+        yield vertex, parent, depth
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # the most recently pushed copy of a vertex is popped first, so vertex is its parent
+        stack.extend([(val, vertex, depth + 1)
+                      for val in reversed(neighbors(vertex)) if val not in visited])
+
+
+def bfs_order(v_start, neighbors, stop=None):
+    """
+    Generator that yields the vertices reached by a breadth-first search from v_start, in the
+    order they are visited. NEIGHBORS is a function that returns the neighbors of a vertex in
+    the order they should be picked (e.g. sorted). STOP is an optional predicate; the search
+    ends after the first vertex for which it returns True has been yielded.
+    Vertices are marked when queued and the queue is a deque, so a full search is O(V + E).
+    """
+    visited = {v_start}
+    queue = deque([v_start])
+
+    while len(queue) > 0:
+        vertex = queue.popleft()
+        yield vertex
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # queues unvisited neighbors in order
+        for val in neighbors(vertex):
+            if val not in visited:
+                visited.add(val)
+                queue.append(val)
+
+
+def bfs_tree(v_start, neighbors, stop=None):
+    """
+    Same search as bfs_order, but yields (vertex, parent, depth) tuples, where parent is the
+    vertex that first queued it (None for v_start) and depth is its distance in edges from
+    v_start.
+    """
+    visited = {v_start}
+    queue = deque([(v_start, None, 0)])
+
+    while len(queue) > 0:
+        vertex, parent, depth = queue.popleft()
+        yield vertex, parent, depth
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # queues unvisited neighbors in order
+        for val in neighbors(vertex):
+            if val not in visited:
+                visited.add(val)
+                queue.append((val, vertex, depth + 1))
+
+
+def dfs_order_ids(v_start, offsets, targets, stop=None):
+    """
+    Same search as dfs_order for vertices numbered 0 to V - 1 whose sorted neighbors are
+    stored as compressed rows: the neighbors of vertex i are targets[offsets[i]:offsets[i + 1]].
+    Visited is a bytearray indexed by vertex, so no vertex is ever hashed.
+    """
+    visited = bytearray(len(offsets) - 1)
+    stack = [v_start]
+
+    while len(stack) > 0:
+        vertex = stack.pop()
+        if visited[vertex]:
+            continue
+        visited[vertex] = 1
+        yield vertex
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # pushes unvisited neighbors in reverse so that they will be popped in the correct order
+        row = targets[offsets[vertex]:offsets[vertex + 1]]
+        stack.extend([val for val in reversed(row) if not visited[val]])
+
+
+def bfs_order_ids(v_start, offsets, targets, stop=None):
+    """
+    Same search as bfs_order for vertices stored as compressed rows, as in dfs_order_ids
+    """
+    visited = bytearray(len(offsets) - 1)
+    visited[v_start] = 1
+    queue = deque([v_start])
+
+    while len(queue) > 0:
+        vertex = queue.popleft()
+        yield vertex
+        # terminates the search once stop is satisfied
+        if stop is not None and stop(vertex):
+            return
+        # queues unvisited neighbors in order
+        for val in targets[offsets[vertex]:offsets[vertex + 1]]:
+            if not visited[val]:
+                visited[val] = 1
+                queue.append(val)
+
+
+def end_vertex(v_end):
+    """
+    Returns a stop predicate that matches v_end, or None if there is no end vertex
+    """
+    if v_end is None:
+        return None
+    return lambda vertex: vertex == v_end
@@ -3,6 +3,220 @@
 # Assignment: 6
 # Description: Assignment 6 for Summer 2021 CS 261, involving undirected graphs.
 
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from itertools import zip_longest
+
+from graph_cache import memoized
+from graph_lock import ReadWriteLock, install_lock
+from graph_traversal import (bfs_order, bfs_order_ids, bfs_tree, dfs_order, dfs_order_ids,
+                             dfs_tree, end_vertex)
+
+
+class NeighborSet(dict):
+    """
+    Neighbors of one vertex as integer ids, stored as the keys of an insertion-ordered
+    dictionary
+    Membership checks are constant time
+    The attribute ordered keeps the same ids in a list sorted by vertex name, updated with
+    bisect on every insert and removal, so traversals read them in alphabetical order
+    without sorting or comparing names
+    """
+
+    __slots__ = ('ordered',)
+
+    def __init__(self):
+        super().__init__()
+        self.ordered = []
+
+    def add(self, v: int, name) -> None:
+        """
+        Add neighbor (does nothing if already present)
+        Name is the function giving the name of an id, which orders the sorted list
+        """
+        if v not in self:
+            self[v] = None
+            insort(self.ordered, v, key=name)
+
+    def remove(self, v: int, name) -> None:
+        """
+        Remove neighbor, raising KeyError if not present
+        """
+        del self[v]
+        del self.ordered[bisect_left(self.ordered, name(v), key=name)]
+
+
+class NeighborNames:
+    """
+    Read-only view of the neighbors of one vertex by name, in insertion order
+    Printed like a list, so the graph displays the same as with list adjacency
+    """
+
+    __slots__ = ('graph', 'row')
+
+    def __init__(self, graph, row: NeighborSet):
+        self.graph = graph
+        self.row = row
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __iter__(self):
+        names = self.graph.names
+        return (names[i] for i in self.row)
+
+    def __len__(self):
+        return len(self.row)
+
+    def __contains__(self, v) -> bool:
+        i = self.graph.ids.get(v)
+        return i is not None and i in self.row
+
+
+class AdjacencyView(Mapping):
+    """
+    Read-only view of an UndirectedGraph by vertex name, in the form of the original
+    adjacency list: keys are the vertices in insertion order, values their neighbors
+    """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __getitem__(self, v) -> NeighborNames:
+        return NeighborNames(self.graph, self.graph.rows[self.graph.ids[v]])
+
+    def __iter__(self):
+        return iter(self.graph.ids)
+
+    def __len__(self):
+        return len(self.graph.ids)
+
+    def __contains__(self, v) -> bool:
+        return v in self.graph.ids
+
+
+class ConnectivityIndex:
+    """
+    Disjoint-set union over the vertex ids of an UndirectedGraph, updated on every insert
+    Answers component count, same-component and acyclicity queries in near-constant time
+    A union cannot be undone, so removals mark the index stale and it is rebuilt
+    from the graph on the next query
+    Queries write to the index too (the rebuild, and path halving in find), so they take
+    turns on an internal mutex even while the graph's read lock lets them run in parallel
+    Updates come from the graph's mutators, which hold its write lock and so never overlap
+    a query
+    """
+
+    def __init__(self, graph):
+        """
+        Build index for the current contents of graph
+        """
+        self.graph = graph
+        self.mutex = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Recompute the index from scratch in O(V + E)
+        """
+        rows = self.graph.rows
+        # free ids get a set of their own, which is not counted as a component
+        self.parent = array('i', range(len(rows)))
+        self.size = array('i', [1]) * len(rows)
+        self.components = len(self.graph.ids)
+        self.edges = 0
+        for key in self.graph.ids.values():
+            for val in rows[key]:
+                # each edge is listed under both endpoints, so only one is counted
+                if key < val:
+                    self.add_edge(key, val)
+        self.stale = False
+
+    def find(self, v: int) -> int:
+        """
+        Return representative of the set containing v, halving the path on the way
+        """
+        parent = self.parent
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    def add_vertex(self, v: int) -> None:
+        """
+        Record new vertex as a component of its own
+        The graph reuses free ids, so v is either one of them or the next id
+        """
+        if v == len(self.parent):
+            self.parent.append(v)
+            self.size.append(1)
+        else:
+            self.parent[v] = v
+            self.size[v] = 1
+        self.components += 1
+
+    def add_edge(self, u: int, v: int) -> None:
+        """
+        Record new edge, merging the components of its endpoints
+        """
+        self.edges += 1
+        root_u, root_v = self.find(u), self.find(v)
+        if root_u == root_v:
+            return
+        # attaches the smaller set below the larger one
+        if self.size[root_u] < self.size[root_v]:
+            root_u, root_v = root_v, root_u
+        self.parent[root_v] = root_u
+        self.size[root_u] += self.size[root_v]
+        self.components -= 1
+
+    def invalidate(self) -> None:
+        """
+        Mark index stale after an edge or vertex is removed
+        """
+        self.stale = True
+
+    def refresh(self) -> None:
+        """
+        Rebuild index if it is stale
+        """
+        if self.stale:
+            self.rebuild()
+
+    def count(self) -> int:
+        """
+        Return number of connected components
+        """
+        with self.mutex:
+            self.refresh()
+            return self.components
+
+    def connected(self, u: str, v: str) -> bool:
+        """
+        Return True if u and v are vertices in the same component
+        """
+        with self.mutex:
+            self.refresh()
+            u, v = self.graph.ids.get(u), self.graph.ids.get(v)
+            if u is None or v is None:
+                return False
+            return self.find(u) == self.find(v)
+
+    def acyclic(self) -> bool:
+        """
+        Return True if the graph is a forest, i.e. has exactly V - C edges
+        """
+        with self.mutex:
+            self.refresh()
+            return self.edges == len(self.graph.ids) - self.components
+
 
 class UndirectedGraph:
     """
@@ -40,17 +254,156 @@ class UndirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    # optional ConnectivityIndex, enabled with track_connectivity()
+    connectivity = None
+    # bumped by every change to the graph, so memoized queries know when to recompute
+    version = 0
+    # ReadWriteLock used by the concurrency mode, enabled with enable_locking()
+    lock = None
+    read_methods = ('get_vertices', 'get_edges', 'is_valid_path', 'dfs', 'bfs',
+                    'count_connected_components', 'connected_components', 'same_component',
+                    'has_cycle', 'freeze')
+    write_methods = ('add_vertex', 'add_edge', 'remove_edge', 'remove_vertex',
+                     'remove_vertices', 'load_edges', 'track_connectivity')
+    iter_methods = ('iter_edges', 'iter_dfs', 'iter_bfs')
+
+    @property
+    def adj_list(self) -> AdjacencyView:
+        """
+        Read-only view of the graph by vertex name, in the form of an adjacency list
+        The graph itself is stored by integer id: ids maps each name to its id, names and
+        rows give the name and the NeighborSet of each id, and names are only looked up
+        when a result is returned
+        """
+        return AdjacencyView(self)
+
+    @adj_list.setter
+    def adj_list(self, value: dict) -> None:
+        """
+        Replace the contents of the graph with those of an adjacency list by name
+        """
+        self.ids = dict()
+        self.names = []
+        self.rows = []
+        # ids of removed vertices, reused before new ones so the arrays stay compact
+        self.free = []
+        self.version += 1
+        if self.connectivity is not None:
+            self.connectivity.invalidate()
+        for v in value:
+            self.intern(v)
+        self.load_edges((v, u) for v in value for u in value[v])
+
+    def intern(self, v: str) -> int:
+        """
+        Return id of vertex v, adding it as a vertex without edges if it is new
+        """
+        i = self.ids.get(v)
+        if i is not None:
+            return i
+        if len(self.free) > 0:
+            i = self.free.pop()
+            self.names[i] = v
+            self.rows[i] = NeighborSet()
+        else:
+            i = len(self.names)
+            self.names.append(v)
+            self.rows.append(NeighborSet())
+        self.ids[v] = i
+        self.version += 1
+        if self.connectivity is not None:
+            self.connectivity.add_vertex(i)
+        return i
+
+    def release(self, i: int) -> None:
+        """
+        Free id i of a vertex whose edges have been removed
+        """
+        del self.ids[self.names[i]]
+        self.names[i] = None
+        self.rows[i] = None
+        self.free.append(i)
+
+    def enable_locking(self) -> ReadWriteLock:
+        """
+        Switch graph to concurrency mode and return its lock
+        Queries then hold the lock for reading and run in parallel, while changes hold it
+        for writing, so readers never see a half-applied update
+        Graphs that are not in concurrency mode do not pay for locking
+        """
+        if self.lock is None:
+            self.lock = ReadWriteLock()
+            install_lock(self, self.lock, self.read_methods, self.write_methods,
+                         self.iter_methods)
+        return self.lock
+
+    def freeze(self) -> 'FrozenUndirectedGraph':
+        """
+        Return read-only, array-backed snapshot of the graph for query serving
+        Ids there are given in sorted order and the rows packed into arrays, so a graph that
+        has stopped changing can be saved, memory-mapped and shared by worker processes
+        """
+        return FrozenUndirectedGraph(self)
+
+    @classmethod
+    def from_edge_arrays(cls, u_seq, v_seq) -> 'UndirectedGraph':
+        """
+        Build graph from parallel sequences of edge endpoints in one pass
+        Same result as passing the edges as start_edges, without an add_edge call per edge
+        Raises ValueError if the sequences differ in length
+        """
+        def edges():
+            missing = object()
+            for edge in zip_longest(u_seq, v_seq, fillvalue=missing):
+                if missing in edge:
+                    raise ValueError('edge arrays must have the same length')
+                yield edge
+
+        graph = cls()
+        graph.load_edges(edges())
+        return graph
+
+    @classmethod
+    def from_iterable(cls, edges) -> 'UndirectedGraph':
+        """
+        Build graph from an iterable of (u, v) pairs, reading it only once
+        """
+        graph = cls()
+        graph.load_edges(edges)
+        return graph
+
+    def load_edges(self, edges) -> None:
+        """
+        Add every (u, v) pair of edges, matching calls to add_edge in order
+        The sorted neighbor lists of the rows that change are sorted once at the end instead
+        of on every insert
+        """
+        changed = set()
+        for u, v in edges:
+            if u == v:
+                continue
+            j = self.intern(v)
+            i = self.intern(u)
+            if i in self.rows[j]:
+                continue
+            self.rows[j][i] = None
+            self.rows[i][j] = None
+            changed.add(i)
+            changed.add(j)
+            if self.connectivity is not None:
+                self.connectivity.add_edge(i, j)
+        name = self.names.__getitem__
+        for i in changed:
+            self.rows[i].ordered = sorted(self.rows[i], key=name)
+        if len(changed) > 0:
+            self.version += 1
+
     def add_vertex(self, v: str) -> None:
         """
         Add new vertex to the graph
         """
-        # returns if vertex already exists
-        for key in self.adj_list:
-            if key == v:
-                return
-
-        # adds vertex
-        self.adj_list[v] = []
+        # does nothing if vertex already exists
+        self.intern(v)
 
     def add_edge(self, u: str, v: str) -> None:
         """
@@ -58,89 +411,120 @@ class UndirectedGraph:
         """
         if u == v:
             return
+        # interns both endpoints, adding the ones that are not in the graph yet
+        j = self.intern(v)
+        i = self.intern(u)
+        # returns if the edge already exists
+        if i in self.rows[j]:
+            return
 
-        # checks for key in the dictionary and creates the key if not present
-        if v not in self.adj_list:
-            self.adj_list[v] = []
-        # checks for u in the list and adds it to the list if not present
-        if u not in self.adj_list[v]:
-            self.adj_list[v].append(u)
-
-        # checks for key in the dictionary and creates the key if not present
-        if u not in self.adj_list:
-            self.adj_list[u] = []
-        # checks for u in the list and adds it to the list if not present
-        if v not in self.adj_list[u]:
-            self.adj_list[u].append(v)
+        # adds each endpoint to the neighbors of the other
+        name = self.names.__getitem__
+        self.rows[j].add(i, name)
+        self.rows[i].add(j, name)
+        self.version += 1
+        if self.connectivity is not None:
+            self.connectivity.add_edge(i, j)
 
     def remove_edge(self, v: str, u: str) -> None:
         """
         Remove edge from the graph
         """
-        # checks for key in the dictionary and returns if not present
-        if u not in self.adj_list or v not in self.adj_list:
+        # returns if either vertex or the edge does not exist
+        i, j = self.ids.get(v), self.ids.get(u)
+        if i is None or j is None or j not in self.rows[i]:
             return
-        # checks for edge and removes if present
-        if u in self.adj_list[v] and v in self.adj_list[u]:
-            self.adj_list[v].remove(u)
-            self.adj_list[u].remove(v)
+        name = self.names.__getitem__
+        self.rows[i].remove(j, name)
+        self.rows[j].remove(i, name)
+        self.version += 1
+        if self.connectivity is not None:
+            self.connectivity.invalidate()
 
     def remove_vertex(self, v: str) -> None:
         """
         Remove vertex and all connected edges
         """
         # returns if vertex does not exist
-        if v not in self.adj_list:
+        i = self.ids.get(v)
+        if i is None:
             return
-        # removes vertex
-        del self.adj_list[v]
-        # removes associated edges
-        for key in self.adj_list:
-            if v in self.adj_list[key]:
-                self.adj_list[key].remove(v)
+        # removes associated edges, which are listed in both endpoints' neighbors
+        name = self.names.__getitem__
+        for key in self.rows[i]:
+            self.rows[key].remove(i, name)
+        self.release(i)
+        self.version += 1
+        if self.connectivity is not None:
+            self.connectivity.invalidate()
 
+    def remove_vertices(self, vertices) -> None:
+        """
+        Remove several vertices and all connected edges
+        Vertices that do not exist are ignored
+        """
+        # collects the ids of the vertices to remove that exist
+        removed = {self.ids[v] for v in vertices if v in self.ids}
+        # removes edges to remaining vertices, skipping neighbors that are removed as well
+        name = self.names.__getitem__
+        for i in removed:
+            for key in self.rows[i]:
+                if key not in removed:
+                    self.rows[key].remove(i, name)
+        # removes vertices
+        for i in removed:
+            self.release(i)
+        if len(removed) > 0:
+            self.version += 1
+            if self.connectivity is not None:
+                self.connectivity.invalidate()
+
+    @memoized
     def get_vertices(self) -> []:
         """
         Return list of vertices in the graph (any order)
         """
-        # creates list
-        vertices = []
-        # iterates through dictionary to add each vertex to list
-        for key in self.adj_list:
-            vertices.append(key)
-        return vertices
+        return list(self.ids)
 
+    @memoized
     def get_edges(self) -> []:
         """
         Return list of edges in the graph (any order)
         """
-        # creates list
-        edges = []
-        # iterates through each key and value
-        for key in self.adj_list:
-            for value in self.adj_list[key]:
-                # ignores duplicates
-                if (value, key) not in edges:
-                    # adds tuple to list
-                    edges.append((key, value))
-        return edges
+        return list(self.iter_edges())
+
+    def iter_edges(self):
+        """
+        Yield edges of the graph one at a time, in the same order as get_edges
+        """
+        names = self.names
+        # tracks ids whose edges have all been yielded
+        done = set()
+        # iterates over a copy of the keys and translates each row when it is reached, as in
+        # concurrency mode the graph can change between items, and skips removed vertices
+        for key in list(self.ids):
+            i = self.ids.get(key)
+            if i is None:
+                continue
+            # ignores edges already yielded from the other endpoint
+            values = [names[j] for j in self.rows[i] if j not in done]
+            done.add(i)
+            for value in values:
+                yield key, value
 
     def is_valid_path(self, path: []) -> bool:
         """
         Return true if provided path is valid, False otherwise
         """
-        # empty path is valid
-        if len(path) == 0:
-            return True
-        # handles path of size 1
-        if len(path) == 1:
-            # checks that vertex exists
-            if path[0] not in self.adj_list:
-                return False
+        # translates path to ids, and a vertex that is not in the graph makes it invalid
+        # (an empty path is valid)
+        ids = [self.ids.get(v) for v in path]
+        if None in ids:
+            return False
 
         # iterates through list and checks for valid edges between consecutive vertices
-        for num in range(len(path)-1):
-            if path[num] not in self.adj_list[path[num+1]]:
+        for num in range(len(ids) - 1):
+            if ids[num + 1] not in self.rows[ids[num]]:
                 return False
         return True
 
@@ -149,165 +533,418 @@ class UndirectedGraph:
         Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
-        # initializes empty list of visited vertices and an empty stack
-        visited = []
-        stack = []
         # returns an empty list if the starting vertex is not in the graph
-        if v_start not in self.adj_list:
-            return visited
-
-        # adds v_start to stack
-        stack.append(v_start)
-
-        # proceed as if there is no end vertex
-        if v_end not in self.adj_list or v_end is None:
-            while len(stack) > 0:
-                vertex = stack.pop()
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # sorts and reverses temp list
-                    temp = self.adj_list[vertex]
-                    temp.sort()
-                    temp.reverse()
-                    # appends values in reverse so that they will be popped in the correct order
-                    for val in temp:
-                        stack.append(val)
-            return visited
-
-        # v_end exists
-        while len(stack) > 0:
-            vertex = stack.pop()
-            # terminates the search at v_end
-            if vertex == v_end:
-                visited.append(vertex)
-                return visited
-            if vertex not in visited:
-                visited.append(vertex)
-                # sorts and reverses temp list
-                temp = self.adj_list[vertex]
-                temp.sort()
-                temp.reverse()
-                # appends values in reverse so that they will be popped in the correct order
-                for val in temp:
-                    stack.append(val)
-        return visited
+        if v_start not in self.ids:
+            return []
+        order = dfs_order(self.ids[v_start], self.ordered_ids, self.end_id(v_end))
+        return [self.names[i] for i in order]
 
     def bfs(self, v_start, v_end=None) -> []:
         """
         Return list of vertices visited during BFS search
         Vertices are picked in alphabetical order
         """
-        # initializes empty list of visited vertices and an empty queue
-        visited = []
-        queue = []
         # returns an empty list if the starting vertex is not in the graph
-        if v_start not in self.adj_list:
-            return visited
-
-        # adds v_start to queue
-        queue.append(v_start)
-
-        # proceed as if there is no end vertex
-        if v_end not in self.adj_list or v_end is None:
-            while len(queue) > 0:
-                vertex = queue.pop(0)
-                if vertex not in visited:
-                    visited.append(vertex)
-                    # sorts temp list
-                    temp = self.adj_list[vertex]
-                    temp.sort()
-                    # appends sorted values so that they will be popped in the correct order
-                    for val in temp:
-                        if val not in visited:
-                            queue.append(val)
-            return visited
-
-        # v_end exists
-        while len(queue) > 0:
-            vertex = queue.pop(0)
-            # terminates the search at v_end
-            if vertex == v_end:
-                visited.append(vertex)
-                return visited
-            if vertex not in visited:
-                visited.append(vertex)
-                # sorts temp list
-                temp = self.adj_list[vertex]
-                temp.sort()
-                # appends sorted values so that they will be popped in the correct order
-                for val in temp:
-                    if val not in visited:
-                        queue.append(val)
-        return visited
+        if v_start not in self.ids:
+            return []
+        order = bfs_order(self.ids[v_start], self.ordered_ids, self.end_id(v_end))
+        return [self.names[i] for i in order]
+
+    def end_id(self, v_end):
+        """
+        Return stop predicate on ids matching v_end, or None if v_end is not in the graph
+        """
+        if v_end is None or v_end not in self.ids:
+            return None
+        return end_vertex(self.ids[v_end])
+
+    def iter_dfs(self, v_start, stop=None, tree=False):
+        """
+        Yield vertices one at a time in the same order as dfs
+        Stop is an optional predicate; the search ends after the first vertex matching it
+        If tree is True, yield (vertex, parent, depth) tuples instead
+        """
+        return self.search(dfs_tree if tree else dfs_order, v_start, stop, tree)
+
+    def iter_bfs(self, v_start, stop=None, tree=False):
+        """
+        Yield vertices one at a time in the same order as bfs
+        Stop is an optional predicate; the search ends after the first vertex matching it
+        If tree is True, yield (vertex, parent, depth) tuples instead
+        """
+        return self.search(bfs_tree if tree else bfs_order, v_start, stop, tree)
+
+    def search(self, order, v_start, stop, tree):
+        """
+        Helper for the traversals that runs order on ids and yields names
+        In concurrency mode writers can run between items, so vertices removed since they
+        were queued (whose names are cleared) are skipped
+        """
+        # yields nothing if the starting vertex is not in the graph
+        if v_start not in self.ids:
+            return
+        names = self.names
+        if stop is not None:
+            named_stop = stop
+            stop = lambda i: names[i] is not None and named_stop(names[i])
+        if tree:
+            for i, parent, depth in order(self.ids[v_start], self.ordered_ids, stop):
+                if names[i] is not None:
+                    yield names[i], None if parent is None else names[parent], depth
+        else:
+            for i in order(self.ids[v_start], self.ordered_ids, stop):
+                if names[i] is not None:
+                    yield names[i]
+
+    def ordered_ids(self, i: int) -> []:
+        """
+        Return ids of the neighbors of i in alphabetical order (the stored list, not a copy)
+        A vertex removed since it was queued has no neighbors
+        """
+        row = self.rows[i]
+        return row.ordered if row is not None else []
+
+    def track_connectivity(self) -> None:
+        """
+        Maintain a ConnectivityIndex from now on, so that count_connected_components,
+        same_component and has_cycle are answered without traversing the graph
+        """
+        if self.connectivity is None:
+            self.connectivity = ConnectivityIndex(self)
 
+    @memoized
     def count_connected_components(self):
         """
         Return number of connected components in the graph
         """
-        # tracks all visited nodes
-        connected = []
-        # tracks number of connected components
+        if self.connectivity is not None:
+            return self.connectivity.count()
+        return self.component_labels()[1]
+
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Return True if u and v are vertices in the same connected component
+        """
+        if self.connectivity is not None:
+            return self.connectivity.connected(u, v)
+        if u not in self.ids or v not in self.ids:
+            return False
+        target = self.ids[v]
+        return target in bfs_order(self.ids[u], self.ordered_ids, end_vertex(target))
+
+    @memoized
+    def connected_components(self) -> dict:
+        """
+        Return dictionary mapping each vertex to the label of its connected component
+        Labels are 0, 1, 2, ... in the order components are first seen in adj_list
+        """
+        labels = self.component_labels()[0]
+        return {key: labels[i] for key, i in self.ids.items()}
+
+    @memoized
+    def component_labels(self) -> tuple:
+        """
+        Return array with the connected component label of each id, and number of components
+        """
+        # free ids keep label -1
+        labels = array('i', [-1]) * len(self.rows)
         count = 0
 
-        for key in self.adj_list:
-            # checks whether a vertex has been visited
-            if key not in connected:
-                count += 1
-                temp = self.dfs(key)
-                # iterates through vertex's connections
-                for val in temp:
-                    connected.append(val)
-        return count
+        for key in self.ids.values():
+            # checks whether a vertex has been labeled
+            if labels[key] >= 0:
+                continue
+            # labels every vertex reachable from key with the next label
+            labels[key] = count
+            stack = [key]
+            while len(stack) > 0:
+                for val in self.rows[stack.pop()]:
+                    if labels[val] < 0:
+                        labels[val] = count
+                        stack.append(val)
+            count += 1
+        return labels, count
 
+    @memoized
     def has_cycle(self):
         """
         Return True if graph contains a cycle, False otherwise
         """
+        if self.connectivity is not None:
+            return not self.connectivity.acyclic()
 
-        # performs DFS on each key to check for a cycle
-        for key in self.adj_list:
-            # calls helper cycle_dfs on key and returns True if a cycle is found
-            if self.cycle_dfs(key) is True:
+        # tracks visited ids across all searches, so each component is searched once
+        visited = set()
+
+        for key, i in self.ids.items():
+            # calls helper cycle_dfs on unvisited key and returns True if a cycle is found
+            if i not in visited and self.cycle_dfs(key, visited) is True:
                 return True
         return False
 
-    def cycle_dfs(self, v_start):
+    def cycle_dfs(self, v_start, visited=None):
         """
         Helper method for has_cycle, using DFS algorithm. Returns True if a cycle is found, and
-        False otherwise.
+        False otherwise. Visited is a set of vertex ids and can be shared between calls so that
+        a component is only searched once.
         Citation: I worked with a tutor, who taught me to pass a tuple to the stack
         to track a parent element.
         """
-        # initializes empty list of visited vertices and an empty stack
-        visited = []
-        stack = []
-        # returns an empty list if the starting vertex is not in the graph
-        if v_start not in self.adj_list:
-            return visited
+        if visited is None:
+            visited = set()
+        # returns False if the starting vertex is not in the graph
+        if v_start not in self.ids:
+            return False
 
         # adds v_start to stack
-        stack.append((v_start, None))
+        start = self.ids[v_start]
+        visited.add(start)
+        stack = [(start, None)]
 
         while len(stack) > 0:
             # sets tuple to vertex and parent
             vertex, parent = stack.pop()
 
-            if vertex not in visited:
-                visited.append(vertex)
-                # sorts and reverses temp list
-                temp = self.adj_list[vertex]
-                temp.sort()
-                temp.reverse()
-                # appends values in reverse so that they will be popped in the correct order
-                for val in temp:
-                    # conditions for cycle
-                    if val in visited and val != parent:
-                        return True
-                    # adds tuple to stack consisting of val and vertex as new parent
-                    stack.append((val, vertex))
+            for val in self.rows[vertex]:
+                # the edge back to the parent is the one the search came from
+                if val == parent:
+                    continue
+                # any other edge to a visited vertex closes a cycle
+                if val in visited:
+                    return True
+                # adds tuple to stack consisting of val and vertex as new parent
+                visited.add(val)
+                stack.append((val, vertex))
         return False
 
 
+class FrozenUndirectedGraph:
+    """
+    Read-only snapshot of an UndirectedGraph for query serving, made with freeze()
+    Vertex names are interned as integer ids given in sorted order, and the neighbors of
+    vertex i are targets[offsets[i]:offsets[i + 1]], already sorted (compressed sparse rows)
+    Queries run on the integer arrays and translate ids back to names only when returning,
+    so traversals never hash strings or sort, and the arrays can be shared by worker processes
+    """
+
+    def __init__(self, graph=None):
+        """
+        Store snapshot of graph (an UndirectedGraph) as interned ids and neighbor arrays
+        """
+        # names[i] is the name of vertex i, ids maps names back to ids
+        self.names = []
+        self.ids = dict()
+        self.offsets = array('q', [0])
+        self.targets = array('i')
+
+        if graph is not None:
+            self.names = sorted(graph.ids)
+            self.ids = {name: i for i, name in enumerate(self.names)}
+            # maps the ids of graph to the ones given here in sorted order
+            renumber = array('i', [-1]) * len(graph.rows)
+            for i, name in enumerate(self.names):
+                renumber[graph.ids[name]] = i
+            for name in self.names:
+                # rows of graph are sorted by name, so the new ids are ascending
+                ordered = graph.rows[graph.ids[name]].ordered
+                self.targets.extend([renumber[j] for j in ordered])
+                self.offsets.append(len(self.targets))
+
+    def __str__(self):
+        """
+        Return content of the graph in the same form as UndirectedGraph
+        """
+        out = [f'{self.names[i]}: {[self.names[j] for j in self.neighbors(i)]}'
+               for i in range(len(self.names))]
+        out = '\n  '.join(out)
+        if len(out) < 70:
+            out = out.replace('\n  ', ', ')
+            return f'GRAPH: {{{out}}}'
+        return f'GRAPH: {{\n  {out}}}'
+
+    def read_only(self, *args, **kwargs):
+        """
+        Replaces every method that would change the graph
+        """
+        raise TypeError('FrozenUndirectedGraph is read-only')
+
+    add_vertex = add_edge = remove_edge = remove_vertex = remove_vertices = read_only
+
+    def freeze(self) -> 'FrozenUndirectedGraph':
+        """
+        Return the snapshot itself, as it cannot change
+        """
+        return self
+
+    def neighbors(self, i: int) -> array:
+        """
+        Return ids of the neighbors of vertex i in ascending (alphabetical) order
+        """
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def has_edge(self, i: int, j: int) -> bool:
+        """
+        Return True if vertices with ids i and j are adjacent
+        """
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        pos = bisect_left(self.targets, j, lo, hi)
+        return pos < hi and self.targets[pos] == j
+
+    def get_vertices(self) -> []:
+        """
+        Return list of vertices in the graph (alphabetical order)
+        """
+        return list(self.names)
+
+    def get_edges(self) -> []:
+        """
+        Return list of edges in the graph (any order)
+        """
+        return list(self.iter_edges())
+
+    def iter_edges(self):
+        """
+        Yield edges of the graph one at a time
+        """
+        for i in range(len(self.names)):
+            for j in self.neighbors(i):
+                # each edge is stored under both endpoints, so only one is yielded
+                if i < j:
+                    yield self.names[i], self.names[j]
+
+    def is_valid_path(self, path: []) -> bool:
+        """
+        Return true if provided path is valid, False otherwise
+        """
+        for name in path:
+            if name not in self.ids:
+                return False
+        for num in range(len(path) - 1):
+            if not self.has_edge(self.ids[path[num]], self.ids[path[num + 1]]):
+                return False
+        return True
+
+    def dfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during DFS search
+        Vertices are picked in alphabetical order
+        """
+        if v_start not in self.ids:
+            return []
+        order = dfs_order_ids(self.ids[v_start], self.offsets, self.targets, self.end_id(v_end))
+        return [self.names[i] for i in order]
+
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search
+        Vertices are picked in alphabetical order
+        """
+        if v_start not in self.ids:
+            return []
+        order = bfs_order_ids(self.ids[v_start], self.offsets, self.targets, self.end_id(v_end))
+        return [self.names[i] for i in order]
+
+    def end_id(self, v_end):
+        """
+        Return stop predicate on ids matching v_end, or None if v_end is not in the graph
+        """
+        if v_end is None or v_end not in self.ids:
+            return None
+        return end_vertex(self.ids[v_end])
+
+    def iter_dfs(self, v_start, stop=None, tree=False):
+        """
+        Yield vertices one at a time in the same order as dfs
+        Stop is an optional predicate; the search ends after the first vertex matching it
+        If tree is True, yield (vertex, parent, depth) tuples instead
+        """
+        return self.search(dfs_tree if tree else dfs_order_ids, v_start, stop, tree)
+
+    def iter_bfs(self, v_start, stop=None, tree=False):
+        """
+        Yield vertices one at a time in the same order as bfs
+        Stop is an optional predicate; the search ends after the first vertex matching it
+        If tree is True, yield (vertex, parent, depth) tuples instead
+        """
+        return self.search(bfs_tree if tree else bfs_order_ids, v_start, stop, tree)
+
+    def search(self, order, v_start, stop, tree):
+        """
+        Helper for the traversals that runs order on ids and yields names
+        Plain orders walk the compressed rows, while tree searches use the shared core
+        """
+        # yields nothing if the starting vertex is not in the graph
+        if v_start not in self.ids:
+            return
+        names = self.names
+        if stop is not None:
+            named_stop = stop
+            stop = lambda i: named_stop(names[i])
+        if tree:
+            for i, parent, depth in order(self.ids[v_start], self.neighbors, stop):
+                yield names[i], None if parent is None else names[parent], depth
+        else:
+            for i in order(self.ids[v_start], self.offsets, self.targets, stop):
+                yield names[i]
+
+    def component_labels(self) -> array:
+        """
+        Return array with the connected component label of each vertex id
+        """
+        labels = array('i', [-1]) * len(self.names)
+        count = 0
+        for i in range(len(self.names)):
+            if labels[i] >= 0:
+                continue
+            # labels every vertex reachable from i with the next label
+            labels[i] = count
+            stack = [i]
+            while len(stack) > 0:
+                for j in self.neighbors(stack.pop()):
+                    if labels[j] < 0:
+                        labels[j] = count
+                        stack.append(j)
+            count += 1
+        return labels
+
+    @memoized
+    def connected_components(self) -> dict:
+        """
+        Return dictionary mapping each vertex to the label of its connected component
+        """
+        labels = self.component_labels()
+        return {name: labels[i] for i, name in enumerate(self.names)}
+
+    @memoized
+    def count_connected_components(self):
+        """
+        Return number of connected components in the graph
+        """
+        labels = self.component_labels()
+        return max(labels) + 1 if len(labels) > 0 else 0
+
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Return True if u and v are vertices in the same connected component
+        """
+        if u not in self.ids or v not in self.ids:
+            return False
+        labels = self.connected_components()
+        return labels[u] == labels[v]
+
+    @memoized
+    def has_cycle(self):
+        """
+        Return True if graph contains a cycle, False otherwise
+        """
+        # a forest has exactly V - C edges, and every extra edge closes a cycle
+        edges = len(self.targets) // 2
+        return edges > len(self.names) - self.count_connected_components()
+
+    # a snapshot never changes, so memoized results stay valid
+    version = 0
+
+
 if __name__ == '__main__':
 
     print("\nPDF - method add_vertex() / add_edge example 1")
@@ -399,3 +1036,67 @@ if __name__ == '__main__':
         u, v = edge
         g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
         print('{:<10}'.format(case), g.has_cycle())
+
+
+    print("\nmethod iter_dfs() / iter_bfs() example 1")
+    print("----------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    for case in 'ABG':
+        print(case, list(g.iter_dfs(case, stop=lambda vertex: vertex == 'D')),
+              list(g.iter_bfs(case)))
+    print(list(g.iter_bfs('A', tree=True)))
+
+
+    print("\nmethod freeze() example 1")
+    print("-------------------------")
+    frozen = g.freeze()
+    print(frozen)
+    print(all(frozen.dfs(case) == g.dfs(case) and frozen.bfs(case) == g.bfs(case)
+              for case in g.get_vertices()))
+    print(frozen.count_connected_components(), frozen.has_cycle(), frozen.same_component('A', 'H'))
+    g.remove_vertex('B')
+    print(frozen.get_edges() == g.get_edges(), frozen.is_valid_path(['A', 'E', 'B', 'H']))
+    try:
+        frozen.add_edge('A', 'B')
+    except TypeError as error:
+        print(error)
+
+
+    print("\nmethod track_connectivity() example 1")
+    print("-------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    g.track_connectivity()
+    test_cases = (
+        'add QH', 'remove FG', 'remove GQ', 'remove HQ',
+        'remove AE', 'remove CA', 'remove EB', 'remove CE', 'remove DE',
+        'remove BC', 'add EA', 'add EF', 'add GQ', 'add AC', 'add DQ',
+        'add EG', 'add QH', 'remove CD', 'remove BD', 'remove QG')
+    for case in test_cases:
+        command, edge = case.split()
+        u, v = edge
+        g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
+        print(g.count_connected_components(), end=' ')
+    print()
+
+
+    print("\nmethod enable_locking() example 1")
+    print("---------------------------------")
+    g = UndirectedGraph(['AB', 'AC', 'BC', 'CD', 'DE'])
+    g.enable_locking()
+
+    def in_thread(method, *args):
+        # runs a change in another thread, while an iterator of this thread is suspended
+        thread = threading.Thread(target=method, args=args)
+        thread.start()
+        thread.join()
+
+    edges = g.iter_edges()
+    print(next(edges))
+    in_thread(g.add_edge, 'A', 'F')
+    print(list(edges))
+    order = g.iter_bfs('A')
+    print(next(order), next(order))
+    in_thread(g.remove_vertex, 'C')
+    print(list(order))